@@ -133,6 +133,7 @@ export {
     fetchConversationDetail,
     fetchReferenceDetails,
     sendMessage,
+    stopMessage,
     rateMessage,
     createShare,
     fetchUserInfo,
@@ -21,6 +21,8 @@ export interface ApiDetailConfig {
     conversationDetailApi?: string;
     /** 发送消息接口路径 */
     sendMessageApi?: string;
+    /** 停止生成接口路径 */
+    stopMessageApi?: string;
     /** 评分接口路径 */
     rateApi?: string;
     /** 分享接口路径 */
@@ -78,6 +80,7 @@ export const defaultApiDetailConfig: ApiDetailConfig = {
     conversationDeleteApi: '/chat/conversation/delete',
     conversationDetailApi: '/chat/messages',
     sendMessageApi: '/chat/message',
+    stopMessageApi: '/chat/message/stop',
     rateApi: '/feedback/rate',
     shareApi: '/share/create',
     userInfoApi: '/account/info',
@@ -262,6 +265,16 @@ export const sendMessage = async (
     return httpService.post(apiPath, params, _options);
 };
 
+/**
+ * 停止生成（服务端立即取消上游生成）
+ * @param params 停止参数（StreamId 或 ConversationId）
+ * @param apiPath API 路径
+ */
+export const stopMessage = async (params: object, apiPath?: string): Promise<any> => {
+    if (!apiPath) throw new Error('apiPath is required');
+    return httpService.post(apiPath, params);
+};
+
 /**
  * 评分
  * @param params 评分参数
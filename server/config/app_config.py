@@ -1,11 +1,13 @@
 import logging
-from pydantic import Field, PositiveInt
+from typing import Literal
+from pydantic import Field, NonNegativeInt, PositiveFloat, PositiveInt
 from pydantic_settings import SettingsConfigDict
 
 from .redis_config import RedisConfig
 from .pgsql_config import PGSqlConfig
 from .tcadp_config import TCADPConfig
 from .oauth_config import OAuthConfig
+from .http_config import HttpClientConfig
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +17,7 @@ class TAgenticConfig(
     PGSqlConfig,
     TCADPConfig,
     OAuthConfig,
+    HttpClientConfig,
 ):
     LOG_LEVEL: str = Field(
         description="Log level of the server, can be one of: CRITICAL, FATAL, ERROR, WARN, WARNING, INFO, DEBUG",
@@ -56,16 +59,77 @@ class TAgenticConfig(
         default=24,
     )
 
+    SESSION_TOKEN_CACHE_SIZE: PositiveInt = Field(
+        description="Maximum number of verified session tokens cached per worker to skip repeated JWT verification",
+        default=10000,
+    )
+
+    SESSION_TOKEN_CACHE_TTL: PositiveInt = Field(
+        description="Seconds a verified session token without an 'exp' claim stays cached",
+        default=300,
+    )
+
     AUTO_CREATE_ACCOUNT: bool = Field(
         description="Whether to automatically create an account for new users",
         default=False,
     )
 
+    APP_INFO_REFRESH_INTERVAL: PositiveFloat = Field(
+        description="Seconds between background refreshes of the application list (names, greetings, modes); "
+            "with REDIS_ENABLED the fetched info is shared so one worker refreshes for all",
+        default=60,
+    )
+
+    APP_INFO_REFRESH_CONCURRENCY: PositiveInt = Field(
+        description="Maximum number of applications whose info is fetched from upstream concurrently during a refresh",
+        default=8,
+    )
+
     CHAT_MESSAGE_PAGE_SIZE: PositiveInt = Field(
         description="Number of messages to load per page when browsing chat history",
         default=100,
     )
 
+    CHAT_HISTORY_LOCAL_STORE: bool = Field(
+        description=(
+            "Keep a local copy of TCADP conversation records captured from the chat SSE stream and serve "
+            "/chat/messages from it; conversations with gaps fall back to the upstream history API. "
+            "Standard-mode applications are only served from history backfilled from GetMsgRecord, since "
+            "captured records lack some of its fields. "
+            "Can be overridden per application with the 'LocalHistory' key of APP_CONFIGS"
+        ),
+        default=True,
+    )
+
+    CHAT_HISTORY_BACKFILL_MAX_RECORDS: NonNegativeInt = Field(
+        description=(
+            "Maximum number of records copied from upstream when backfilling the local history of a conversation "
+            "that did not start on this server; longer conversations keep loading from upstream. 0 disables backfill"
+        ),
+        default=200,
+    )
+
+    CHAT_HISTORY_BACKFILL_INTERVAL: PositiveInt = Field(
+        description=(
+            "Seconds before the local history of a conversation is backfilled from upstream again; "
+            "opening a conversation whose local history is incomplete triggers at most one backfill per interval"
+        ),
+        default=3600,
+    )
+
+    CHAT_CONVERSATION_PAGE_SIZE: PositiveInt = Field(
+        description="Default and maximum number of conversations returned per page by /chat/conversations",
+        default=50,
+    )
+
+    CHAT_CONVERSATION_LIST_UNPAGINATED: bool = Field(
+        description=(
+            "Keep the legacy /chat/conversations behaviour of returning every conversation as a plain list "
+            "when the request has no Limit / Cursor. When disabled, such requests get the first page"
+        ),
+        default=True,
+    )
+
     SERVER_RESPONSE_TIMEOUT: PositiveInt = Field(
         description=(
             "Sanic RESPONSE_TIMEOUT for regular (non-streaming) API responses in seconds. "
@@ -85,11 +149,130 @@ class TAgenticConfig(
         default=5400,
     )
 
+    CHAT_STREAM_GRACE_PERIOD: NonNegativeInt = Field(
+        description=(
+            "Seconds a chat generation keeps running after its client disconnects, so it can be resumed "
+            "via /chat/message/resume with Last-Event-ID. Finished streams are kept for the same period. "
+            "0 cancels the upstream generation as soon as the client disconnects. "
+            "The client's Stop button calls /chat/message/stop, which cancels the generation immediately."
+        ),
+        default=60,
+    )
+
+    CHAT_STREAM_BUFFER_BYTES: PositiveInt = Field(
+        description="Maximum bytes of SSE events buffered for replay per chat stream, older events are evicted first",
+        default=1024 * 1024,
+    )
+
+    CHAT_STREAM_TOTAL_BUFFER_BYTES: PositiveInt = Field(
+        description="Maximum bytes of SSE events buffered for replay across all chat streams of a worker",
+        default=256 * 1024 * 1024,
+    )
+
+    CHAT_STREAM_SUBSCRIBER_MAX_LAG: PositiveInt = Field(
+        description=(
+            "Maximum number of live SSE events a chat stream subscriber (e.g. another tab) may fall behind "
+            "before CHAT_STREAM_SLOW_SUBSCRIBER_POLICY applies. Replayed history does not count."
+        ),
+        default=1000,
+    )
+
+    CHAT_STREAM_SLOW_SUBSCRIBER_POLICY: Literal["drop", "disconnect"] = Field(
+        description=(
+            "What to do with a chat stream subscriber exceeding CHAT_STREAM_SUBSCRIBER_MAX_LAG: "
+            "'drop' skips the backlog and continues with the latest events, "
+            "'disconnect' sends an error event and closes it so the client can resume with Last-Event-ID"
+        ),
+        default="disconnect",
+    )
+
+    CONVERSATION_WRITE_BEHIND_INTERVAL: PositiveFloat = Field(
+        description=(
+            "Seconds between batched writes of conversation LastActiveAt / Title updates. "
+            "Updates are kept in memory until then and flushed once more on shutdown"
+        ),
+        default=2,
+    )
+
+    SSE_PASSTHROUGH: bool = Field(
+        description=(
+            "Relay upstream chat SSE frames as raw bytes instead of decoding and re-encoding every event. "
+            "Only error / request_ack / response.completed frames are parsed. "
+            "Can be overridden per application with the SsePassthrough key in APP_CONFIGS."
+        ),
+        default=True,
+    )
+
+    FILE_UPLOAD_MAX_SIZE: PositiveInt = Field(
+        description=(
+            "Maximum size in bytes of a file sent to /file/upload. Uploads are streamed to storage and "
+            "rejected with 413 as soon as they exceed this size. Only applies to the streaming upload route, "
+            "other routes keep Sanic's REQUEST_MAX_SIZE"
+        ),
+        default=100 * 1024 * 1024,
+    )
+
+    FILE_UPLOAD_INTENT_EXPIRES: PositiveInt = Field(
+        description=(
+            "Seconds a presigned upload from /file/upload/intent stays valid, i.e. how long the browser has to "
+            "upload the file directly to COS and call /file/upload/complete"
+        ),
+        default=3600,
+    )
+
+    FILE_UPLOAD_PART_SIZE: PositiveInt = Field(
+        description=(
+            "Part size in bytes of direct browser-to-COS multipart uploads; files larger than this are uploaded "
+            "in parts when DescribeStorageCredential returns temporary credentials instead of an UploadUrl. "
+            "Must be at least 5 MiB, the minimum part size of COS multipart uploads"
+        ),
+        default=8 * 1024 * 1024,
+        ge=5 * 1024 * 1024,
+    )
+
+    FILE_DEDUPE_TTL: NonNegativeInt = Field(
+        description=(
+            "Seconds an uploaded file stays in the content-hash (SHA-256) index, so that uploading the same "
+            "file again with its Sha256 declared up front returns the existing Url / CosUrl / CosBucket without "
+            "touching COS. A body sent without a declared Sha256 is always uploaded and returned as is. Should not "
+            "exceed the lifetime of objects in the realtime upload bucket. 0 disables upload deduplication"
+        ),
+        default=24 * 3600,
+    )
+
+    FILE_DEDUPE_SCOPE: Literal["account", "application"] = Field(
+        description=(
+            "Scope of upload deduplication: 'account' only reuses files uploaded by the same account, "
+            "'application' also records hashes the server computed while receiving /file/upload under the "
+            "application. A Sha256 declared by the client before uploading is only matched against the "
+            "account's own uploads"
+        ),
+        default="account",
+    )
+
+    FILE_DOWNLOAD_MAX_CONCURRENCY: PositiveInt = Field(
+        description=(
+            "Maximum number of concurrent /file/download streams per account and worker, extra requests get 429"
+        ),
+        default=4,
+    )
+
     RATE_LIMIT: str = Field(
         description="Rate limit configuration in format 'requests/period' (e.g., '100/minute')",
         default="100/minute",
     )
 
+    RATE_LIMIT_RULES: dict[str, str] = Field(
+        description=(
+            "Per-route rate limits keyed by path prefix, matched on whole path segments, e.g. "
+            "'{\"/chat/message\": \"20/minute\", \"/chat/message/resume\": \"100/minute\", "
+            "\"/file/upload\": \"10/minute\"}'. "
+            "A prefix also covers its sub-paths (/chat/message covers /chat/message/resume but not /chat/messages); "
+            "the longest matching prefix wins, other paths use RATE_LIMIT"
+        ),
+        default={},
+    )
+
     CORS_ORIGINS: str = Field(
         description="Allowed CORS origins. Multiple origins separated by comma, "
             "e.g. 'http://localhost,http://127.0.0.1:3000'",
@@ -114,6 +297,11 @@ class TAgenticConfig(
         default="",
     )
 
+    COS_EXECUTOR_WORKERS: PositiveInt = Field(
+        description="Number of threads per worker running blocking COS SDK calls; calls beyond this wait in a queue",
+        default=8,
+    )
+
     model_config = SettingsConfigDict(
         # read from dotenv format config file
         env_file=".env",
@@ -0,0 +1,46 @@
+from pydantic import Field, NonNegativeInt, PositiveFloat, PositiveInt
+from pydantic_settings import BaseSettings
+
+
+class HttpClientConfig(BaseSettings):
+    """
+    Configuration settings for the shared upstream HTTP connection pools
+    """
+
+    HTTP_POOL_LIMIT_PER_HOST: PositiveInt = Field(
+        description="Default maximum number of simultaneous connections kept per upstream host",
+        default=100,
+    )
+
+    HTTP_POOL_HOST_LIMITS: dict[str, PositiveInt] = Field(
+        description="Per-host connection limit overrides, e.g. '{\"lke.tencentcloudapi.com\": 50}'. "
+            "Hosts not listed here use HTTP_POOL_LIMIT_PER_HOST",
+        default={},
+    )
+
+    HTTP_DNS_CACHE_TTL: NonNegativeInt = Field(
+        description="Seconds to cache resolved DNS entries of upstream hosts, 0 disables the cache",
+        default=300,
+    )
+
+    HTTP_KEEPALIVE_TIMEOUT: PositiveInt = Field(
+        description="Seconds an idle keep-alive connection stays in the pool before it is closed",
+        default=30,
+    )
+
+    SSE_MAX_STREAMS: PositiveInt = Field(
+        description="Maximum number of concurrent upstream SSE streams per worker, "
+            "further chats wait for a free slot up to SSE_STREAM_WAIT_TIMEOUT",
+        default=500,
+    )
+
+    SSE_STREAM_WAIT_TIMEOUT: PositiveFloat = Field(
+        description="Seconds a chat waits for a free upstream SSE slot before failing with 503",
+        default=10,
+    )
+
+    SSE_READ_BUFSIZE: PositiveInt = Field(
+        description="High-water mark of the upstream SSE read buffer in bytes, "
+            "a single SSE line must not exceed twice this size",
+        default=1024 * 1024,
+    )
@@ -1,6 +1,6 @@
 from typing import Optional
 
-from pydantic import Field, NonNegativeInt, PositiveInt
+from pydantic import Field, NonNegativeInt, PositiveFloat, PositiveInt
 from pydantic_settings import BaseSettings
 
 
@@ -9,6 +9,12 @@ class RedisConfig(BaseSettings):
     Configuration settings for Redis connection
     """
 
+    REDIS_ENABLED: bool = Field(
+        description="Use Redis for state shared across workers and pods (rate limiting, caches). "
+            "When disabled, those features fall back to per-process memory",
+        default=False,
+    )
+
     REDIS_HOST: str = Field(
         description="Hostname or IP address of the Redis server",
         default="localhost",
@@ -38,3 +44,8 @@ class RedisConfig(BaseSettings):
         description="Enable SSL/TLS for the Redis connection",
         default=False,
     )
+
+    REDIS_SOCKET_TIMEOUT: PositiveFloat = Field(
+        description="Seconds to wait for a Redis connection or reply before treating Redis as unreachable",
+        default=1.0,
+    )
@@ -1,6 +1,6 @@
 import logging
 from typing import Literal
-from pydantic import Field
+from pydantic import Field, NonNegativeInt, PositiveInt
 from pydantic_settings import BaseSettings
 
 logger = logging.getLogger(__name__)
@@ -39,3 +39,83 @@ class TCADPConfig(BaseSettings):
         description="VisitorId type for ADP chat requests. Supported values: CUSTOMER_ID, NAME",
         default="NAME",
     )
+
+    VISITOR_ID_CACHE_SIZE: PositiveInt = Field(
+        description="Maximum number of resolved ADP VisitorIds cached per worker",
+        default=10000,
+    )
+
+    VISITOR_ID_CACHE_TTL: PositiveInt = Field(
+        description="Seconds a resolved ADP VisitorId stays cached (shared through Redis when REDIS_ENABLED, "
+            "other workers pick up account changes within 60 seconds)",
+        default=3600,
+    )
+
+    TC_ACTION_CACHE_SIZE: PositiveInt = Field(
+        description="Maximum number of cached responses of read-only TCADP actions (those with 'cache.ttl' "
+            "in action_version/*.json) per worker, shared through Redis when REDIS_ENABLED",
+        default=2000,
+    )
+
+    TC_REFERENCE_CACHE_SIZE: PositiveInt = Field(
+        description="Maximum number of reference details (DescribeRefer) cached per worker, "
+            "shared through Redis when REDIS_ENABLED",
+        default=10000,
+    )
+
+    TC_REFERENCE_CACHE_TTL: PositiveInt = Field(
+        description="Seconds a reference detail stays cached, details of a ReferBizId do not change",
+        default=7 * 24 * 3600,
+    )
+
+    TC_REFERENCE_NEGATIVE_CACHE_TTL: PositiveInt = Field(
+        description="Seconds a ReferBizId unknown to upstream is remembered as missing",
+        default=300,
+    )
+
+    TC_DOC_PARSE_CACHE_SIZE: PositiveInt = Field(
+        description="Maximum number of successful realtime document parses (/file/parse) cached per worker, "
+            "keyed by AppKey, account, conversation (the parse is bound to its session), CosHash (or ETag) and Size; "
+            "shared through Redis when REDIS_ENABLED",
+        default=10000,
+    )
+
+    TC_DOC_PARSE_CACHE_TTL: NonNegativeInt = Field(
+        description="Seconds a successful document parse result (doc_id) is reused for the same file, "
+            "should not exceed how long upstream keeps the parsed document. 0 disables the cache",
+        default=24 * 3600,
+    )
+
+    TC_WORKSPACE_CREDENTIAL_TTL: PositiveInt = Field(
+        description="Seconds a CreateWorkspaceCredential token is assumed valid when the response carries "
+            "no expiry (neither an expiry field nor a JWT 'exp')",
+        default=300,
+    )
+
+    TC_WORKSPACE_CREDENTIAL_REFRESH_AHEAD: NonNegativeInt = Field(
+        description="Cached workspace credentials with less than this many seconds left are refreshed in the "
+            "background while the current one keeps being used",
+        default=60,
+    )
+
+    TC_LIST_DIR_CACHE_TTL: NonNegativeInt = Field(
+        description="Seconds a workspace directory listing (ListDir) is cached per worker; listings of a "
+            "workspace are dropped as soon as a chat turn of its conversation ends. 0 disables the cache",
+        default=10,
+    )
+
+    TC_LIST_DIR_CACHE_SIZE: PositiveInt = Field(
+        description="Maximum number of workspace directory listings cached per worker",
+        default=2000,
+    )
+
+    TC_LIST_DIR_PREFETCH: bool = Field(
+        description="After listing a directory, list its sub-directories in the background so expanding them "
+            "is served from the cache",
+        default=False,
+    )
+
+    TC_LIST_DIR_PREFETCH_MAX: PositiveInt = Field(
+        description="Maximum number of sub-directories prefetched per listing",
+        default=20,
+    )
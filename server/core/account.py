@@ -17,6 +17,7 @@ from core.error.account import (
 )
 from core.session import SessionToken
 from model.account import Account, AccountThirdParty, AccountRole
+from util.cache import TieredCache
 from util.password import hash, compare
 
 
@@ -33,6 +34,34 @@ class CoreAccountProvider:
 
 
 class CoreAccount:
+    # 账号 -> ADP VisitorId（见 CoreChat.resolve_vendor_account_id），Name / OpenId 变化时失效
+    visitor_id_cache = TieredCache(
+        'visitor_id',
+        maxsize=tagentic_config.VISITOR_ID_CACHE_SIZE,
+        ttl=tagentic_config.VISITOR_ID_CACHE_TTL,
+        local_ttl=60,
+    )
+
+    @staticmethod
+    def visitor_id_key(account_id: str) -> str:
+        # 不同 ADP_VISITOR_ID_TYPE 得到的 VisitorId 不同，切换配置后不能复用旧值
+        return f'{tagentic_config.ADP_VISITOR_ID_TYPE}:{account_id}'
+
+    @staticmethod
+    async def invalidate_visitor_id(account_id: str) -> None:
+        await CoreAccount.visitor_id_cache.delete(CoreAccount.visitor_id_key(str(account_id)))
+
+    @staticmethod
+    async def get_name_and_open_id(db: AsyncSession, account_id: str) -> tuple[Optional[str], Optional[str]] | None:
+        """一次查询取出账号名与第三方 OpenId，账号不存在时返回 None"""
+        row = (await db.execute(
+            select(Account.Name, AccountThirdParty.OpenId)
+                .outerjoin(AccountThirdParty, AccountThirdParty.AccountId == Account.Id)
+                .where(Account.Id == account_id)
+                .limit(1)
+        )).first()
+        return (row.Name, row.OpenId) if row else None
+
     @staticmethod
     async def get_third_party(db: AsyncSession, account_id: str) -> AccountThirdParty:
         account_third_party = (await db.execute(
@@ -178,6 +207,7 @@ class CoreAccount:
         """remove account"""
         await db.delete(account)
         await db.commit()
+        await CoreAccount.invalidate_visitor_id(account.Id)
 
     @staticmethod
     def create_jwt_token(account: Account) -> str:
@@ -227,6 +257,7 @@ class CoreAccount:
             account.ExtraInfo = extra_info
 
         await db.commit()
+        await CoreAccount.invalidate_visitor_id(account.Id)
 
     @staticmethod
     async def customer_auth(
@@ -1,12 +1,15 @@
 import logging
+import uuid
+from typing import Callable
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from config import tagentic_config
 from core.account import CoreAccount
 from core.conversation import CoreConversation
 from model.chat import ChatRecord, ChatConversation
-from vendor.interface import BaseVendor, ConversationCallback, extract_text_from_contents
+from vendor.interface import BaseVendor, ConversationCallback, ErrorInfo, EventType, extract_text_from_contents
 from util.database import db_connection
+from util.helper import to_event
 
 logger = logging.getLogger(__name__)
 
@@ -17,25 +20,34 @@ class CoreChat:
     _GENERIC_ACCOUNT_NAMES = frozenset({"", "user", "anonymous", "guest"})
 
     @staticmethod
-    async def resolve_vendor_account_id(account_id: str) -> str:
-        async with db_connection() as db:
-            account = await CoreAccount.get(db, account_id)
-            account_third_party = await CoreAccount.get_third_party(db, account_id)
-
-        customer_id = (
-            account_third_party.OpenId
-            if account_third_party
-            else str(account.Id if account else account_id)
-        )
-        name = account.Name if account else ""
-
-        if tagentic_config.ADP_VISITOR_ID_TYPE == "NAME":
+    async def resolve_vendor_account_id(account_id: str, db: AsyncSession | None = None) -> str:
+        """db: 可复用调用方已签出的连接；缓存命中时不访问数据库"""
+        cache_key = CoreAccount.visitor_id_key(account_id)
+        vendor_account_id = await CoreAccount.visitor_id_cache.get(cache_key)
+        if vendor_account_id:
+            return vendor_account_id
+
+        if db is not None:
+            identity = await CoreAccount.get_name_and_open_id(db, account_id)
+        else:
+            async with db_connection() as db:
+                identity = await CoreAccount.get_name_and_open_id(db, account_id)
+
+        name, open_id = identity if identity else ("", None)
+        customer_id = open_id if open_id else str(account_id)
+
+        if tagentic_config.ADP_VISITOR_ID_TYPE == "NAME" and name \
+                and name.strip().lower() not in CoreChat._GENERIC_ACCOUNT_NAMES:
             # 仅当 name 具备可区分性时才用它；否则退回 customer_id / account_id，
             # 防止不同账号被 vendor 侧视为同一访客（多轮上下文、限流、统计串号）。
-            if name and name.strip().lower() not in CoreChat._GENERIC_ACCOUNT_NAMES:
-                return name
-            return customer_id or account_id
-        return customer_id or account_id
+            vendor_account_id = name
+        else:
+            vendor_account_id = customer_id or account_id
+
+        # 账号不存在时不缓存，避免账号随后创建 / 关联后仍沿用兜底值
+        if identity is not None:
+            await CoreAccount.visitor_id_cache.set(cache_key, vendor_account_id)
+        return vendor_account_id
 
     @staticmethod
     async def message(
@@ -46,10 +58,14 @@ class CoreChat:
         search_network: bool,
         custom_variables: dict,
         is_channel: bool = False,
+        on_conversation: Callable[[str], None] | None = None,
     ):
         """
         发送聊天消息。
 
+        on_conversation:
+            会话 Id 确定时回调（新会话在 create 之后），用于把进行中的生成绑定到会话上。
+
         is_channel:
             标识本次会话是否为"渠道会话"（企微 / 微信 Bot 等，vendor 侧已存在的会话）。
             渠道会话的权威数据源在 vendor 侧（CAPI DescribeConversationList），
@@ -80,30 +96,45 @@ class CoreChat:
                 Title=title,
             )
 
+        # 非渠道会话在入口处已确保本地记录存在（见下方 bootstrap），回调直接使用内存中的对象
+        local_conversation: ChatConversation | None = None
+
         class CoreConversationCallback(ConversationCallback):
             async def create(self, title: str = None, conversation_id: str = None) -> ChatConversation:
                 # create
-                if title is None:
-                    title = title_source[:10]
                 # 渠道会话：不落地本地 DB，返回临时对象即可（vendor 只用 .Id）
                 if is_channel:
                     logger.info(
                         "[CoreChat.message] skip local create for channel conversation %s (account %s)",
                         conversation_id, account_id,
                     )
-                    return _make_transient_conversation(conversation_id, title)
-                async with db_connection() as db:
-                    conversation = await CoreConversation.create(
-                        db,
-                        account_id,
-                        vendor_app.application_id,
-                        title=title,
-                        conversation_id=conversation_id
-                    )
-                    return conversation
+                    if on_conversation:
+                        on_conversation(conversation_id)
+                    return _make_transient_conversation(conversation_id, title or title_source[:10])
+                # 本地记录已在入口处连同默认标题一起写入，只有厂商另给了标题 / 会话 Id 时才需要再写
+                conversation = local_conversation
+                new_title = title if title is not None and title != conversation.Title else None
+                if conversation_id and conversation_id != str(conversation.Id):
+                    # 厂商侧生成了自己的会话 Id：把预先创建的本地记录改为该 Id（连同标题一条 UPDATE）
+                    async with db_connection() as db:
+                        await CoreConversation.change_id(
+                            db, account_id, str(conversation.Id), conversation_id, title=new_title,
+                        )
+                    conversation.Id = conversation_id
+                    if new_title is not None:
+                        conversation.Title = new_title
+                elif new_title is not None:
+                    CoreConversation.touch(conversation, title=new_title)
+                if on_conversation:
+                    on_conversation(str(conversation.Id))
+                return conversation
 
             async def update(self, conversation_id: str = None, title: str = None) -> ChatConversation:
                 # update
+                if local_conversation is not None and str(local_conversation.Id) == str(conversation_id):
+                    # SSE conversation 事件直接使用内存中的值，LastActiveAt 在后台写入
+                    CoreConversation.touch(local_conversation, title=title)
+                    return local_conversation
                 async with db_connection() as db:
                     conversation = await CoreConversation.get(db, conversation_id)
                     if conversation is None:
@@ -136,36 +167,51 @@ class CoreChat:
                     return conversation
 
         # 判断是否为新会话：
-        # 1) 前端未传 / 传空 ConversationId  -> 视为新会话，由 vendor 触发 create
-        # 2) 前端传了 ConversationId 但本地 DB 不存在该 (account_id, conversation_id) -> 也视为新会话，
-        #    需要补写一条记录（跨设备 / 本地 DB 被清理 / 用户从 vendor 侧拿到 ConversationId 等场景），
-        #    并把已有 conversation_id 透传给 create，避免 DB 自动生成新 UUID 与 vendor 端不一致。
+        # 1) 前端未传 / 传空 ConversationId  -> 视为新会话，由 vendor 触发 create；
+        #    本地记录在入口处以服务端生成的 Id 预先创建，create 回调直接返回该记录
+        # 2) 前端传了 ConversationId 但本地 DB 不存在该会话 -> 补写一条记录（跨设备 / 本地 DB 被清理 /
+        #    用户从 vendor 侧拿到 ConversationId 等场景），保持 is_new_conversation=False，
+        #    让 vendor 走"已有会话继续对话"的分支
         # 3) 渠道会话（is_channel=True）：conversation_id 一定由前端传入（来自 CAPI 拉取到的
         #    vendor 侧渠道会话 Id），本地不存在属于预期 → 不补写，直接以"已有会话继续对话"进入 vendor。
+        #
+        # 非渠道会话的访客 Id 解析、存在性 / 归属检查与补写共用一次连接签出：
+        # 访客 Id 命中缓存时不查库，会话通过 INSERT ... ON CONFLICT DO NOTHING RETURNING 一次往返完成。
         is_new_conversation = False
         if conversation_id is None or conversation_id == '':
             if is_channel:
                 # 渠道会话必须携带既有 ConversationId，否则语义错误
                 raise ValueError("channel conversation requires an existing ConversationId")
             is_new_conversation = True
-        elif not is_channel:
+
+        if is_channel:
+            vendor_account_id = await CoreChat.resolve_vendor_account_id(account_id)
+        else:
             async with db_connection() as db:
-                if not await CoreConversation.exists(db, account_id, conversation_id):
-                    logger.info(
-                        "[CoreChat.message] conversation %s not in local DB for account %s, will create",
-                        conversation_id, account_id,
-                    )
-                    await CoreConversation.create(
-                        db,
-                        account_id,
-                        vendor_app.application_id,
-                        title=title_source[:10],
-                        conversation_id=conversation_id,
-                    )
-                    # 已经在 DB 中创建，无需 vendor 再触发 create 回调；保持 is_new_conversation=False
-                    # 让 vendor 走"已有会话继续对话"的分支。
+                vendor_account_id = await CoreChat.resolve_vendor_account_id(account_id, db)
+                local_conversation, created = await CoreConversation.upsert(
+                    db,
+                    account_id,
+                    vendor_app.application_id,
+                    title=title_source[:10],
+                    conversation_id=str(uuid.uuid4()) if is_new_conversation else conversation_id,
+                )
+            if local_conversation is None:
+                logger.warning(
+                    "[CoreChat.message] conversation %s belongs to another account, rejected for account %s",
+                    conversation_id, account_id,
+                )
+                yield to_event(EventType.ERROR, error=ErrorInfo(Code=404, Message="conversation not found"))
+                return
+            if created and not is_new_conversation:
+                logger.info(
+                    "[CoreChat.message] conversation %s not in local DB for account %s, created",
+                    conversation_id, account_id,
+                )
+
+        if not is_new_conversation and on_conversation:
+            on_conversation(conversation_id)
 
-        vendor_account_id = await CoreChat.resolve_vendor_account_id(account_id)
         async for message in vendor_app.chat(
             vendor_account_id,
             contents,
@@ -1,8 +1,23 @@
+import asyncio
+import base64
+import json
+import logging
+import time
+import uuid
 from datetime import UTC, datetime
+from typing import List
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc, delete
+from sqlalchemy import (
+    select, desc, delete, exists, literal, update, values, column, cast, func, and_, or_, String, DateTime, UUID,
+)
+from sqlalchemy.dialects.postgresql import insert
+from config import tagentic_config
 from sanic.exceptions import SanicException
 from model.chat import ChatConversation, ChatRecord
+from core.history import CoreChatHistory
+from util.database import db_connection
+
+logger = logging.getLogger(__name__)
 
 
 class CoreConversation:
@@ -20,6 +35,50 @@ class CoreConversation:
         )).scalars()
         return conversations
 
+    @staticmethod
+    def encode_cursor(conversation: ChatConversation) -> str:
+        raw = json.dumps([conversation.LastActiveAt.isoformat(), str(conversation.Id)])
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            last_active_at, conversation_id = json.loads(raw)
+            return datetime.fromisoformat(last_active_at), uuid.UUID(conversation_id)
+        except (ValueError, TypeError) as e:
+            raise SanicException("invalid cursor", status_code=400) from e
+
+    @staticmethod
+    async def list_page(
+        db: AsyncSession,
+        account_id: str,
+        application_id: str = None,
+        limit: int = 50,
+        cursor: str = None,
+    ) -> tuple[List[ChatConversation], str | None]:
+        """按 (LastActiveAt DESC, Id) keyset 分页，返回本页会话与下一页游标（没有更多时为 None）
+
+        类体内 list 指向上面的 CoreConversation.list，注解使用 typing.List
+        """
+        stmt = select(ChatConversation).where(ChatConversation.AccountId == account_id)
+        if application_id:
+            stmt = stmt.where(ChatConversation.ApplicationId == application_id)
+        if cursor:
+            last_active_at, conversation_id = CoreConversation.decode_cursor(cursor)
+            stmt = stmt.where(or_(
+                ChatConversation.LastActiveAt < last_active_at,
+                and_(ChatConversation.LastActiveAt == last_active_at, ChatConversation.Id > conversation_id),
+            ))
+        # 排序方向与 ix_chat_conversation_account_*_active 索引一致
+        stmt = stmt.order_by(desc(ChatConversation.LastActiveAt), ChatConversation.Id).limit(limit + 1)
+        conversations = list((await db.execute(stmt)).scalars())
+        next_cursor = None
+        if len(conversations) > limit:
+            conversations = conversations[:limit]
+            next_cursor = CoreConversation.encode_cursor(conversations[-1])
+        return conversations, next_cursor
+
     @staticmethod
     async def delete(db: AsyncSession, account_id: str, conversation_id: str):
         # 先按 ownership 定位会话，防止越权删除他人会话
@@ -35,6 +94,7 @@ class CoreConversation:
         await db.execute(
             delete(ChatRecord).where(ChatRecord.ConversationId == conversation_id)
         )
+        await CoreChatHistory.delete(db, conversation_id)
         await db.delete(conversation)
         await db.commit()
 
@@ -77,6 +137,78 @@ class CoreConversation:
         await db.commit()
         return conversation
 
+    @staticmethod
+    async def upsert(
+        db: AsyncSession,
+        account_id: str,
+        application_id: str,
+        title: str,
+        conversation_id: str,
+    ) -> tuple[ChatConversation | None, bool]:
+        """不存在则创建会话，存在则返回已有会话，并校验归属
+
+        INSERT ... ON CONFLICT DO NOTHING RETURNING 与回查已有记录合并为一条语句，一次往返完成。
+
+        Returns:
+            (会话, 是否新建)；会话属于其他账号时返回 (None, False)
+        """
+        table = ChatConversation.__table__
+        inserted = (
+            insert(table)
+            .values(Id=conversation_id, AccountId=account_id, ApplicationId=application_id, Title=title)
+            .on_conflict_do_nothing(index_elements=[table.c.Id])
+            .returning(*table.c, literal(True).label('Created'))
+            .cte('inserted')
+        )
+        existing = select(*table.c, literal(False).label('Created')).where(
+            table.c.Id == conversation_id,
+            ~exists(select(inserted.c.Id)),
+        )
+        row = (await db.execute(select(inserted).union_all(existing))).first()
+        await db.commit()
+        if row is None:
+            # 并发插入同一 Id 时，冲突行在本语句快照中不可见，回查一次
+            row = (await db.execute(select(*table.c, literal(False).label('Created')).where(
+                table.c.Id == conversation_id
+            ))).first()
+        if row is None or str(row.AccountId) != str(account_id):
+            return None, False
+        conversation = ChatConversation(
+            Id=row.Id,
+            AccountId=row.AccountId,
+            ApplicationId=row.ApplicationId,
+            Title=row.Title,
+            LastActiveAt=row.LastActiveAt,
+            CreatedAt=row.CreatedAt,
+        )
+        return conversation, row.Created
+
+    @staticmethod
+    async def change_id(
+        db: AsyncSession,
+        account_id: str,
+        conversation_id: str,
+        new_conversation_id: str,
+        title: str = None,
+    ):
+        """厂商侧生成了新的会话 Id 时，把预先创建的本地会话改为该 Id（title 不为空时一并更新标题）"""
+        values = {'Id': new_conversation_id}
+        if title is not None:
+            values['Title'] = title
+        await db.execute(update(ChatConversation).where(
+            ChatConversation.AccountId == account_id,
+            ChatConversation.Id == conversation_id,
+        ).values(**values))
+        await db.commit()
+
+    @staticmethod
+    def touch(conversation: ChatConversation, title: str = None):
+        """更新内存中会话的最后活跃时间（及标题），数据库写入交给 ConversationWriteBehind 批量完成"""
+        conversation.LastActiveAt = datetime.now(UTC).replace(tzinfo=None)
+        if title is not None:
+            conversation.Title = title
+        ConversationWriteBehind.add(str(conversation.Id), conversation.LastActiveAt, title)
+
     @staticmethod
     async def get(db: AsyncSession, conversation_id: str) -> ChatConversation:
         conversation = (await db.execute(select(ChatConversation).where(
@@ -90,3 +222,120 @@ class CoreConversation:
         if title is not None:
             conversation.Title = title
         await db.commit()
+
+
+class ConversationWriteBehind:
+    """会话 LastActiveAt / Title 的延迟批量写入
+
+    每轮对话结束时只在内存中登记 (conversation_id, last_active_at, title)，同一会话后写覆盖先写
+    （title 为空时保留之前登记的标题），每 CONVERSATION_WRITE_BEHIND_INTERVAL 秒用一条
+    UPDATE ... FROM (VALUES ...) 批量写入；服务停止前会再刷新一次。
+    """
+
+    _BATCH_SIZE = 500
+
+    _pending: dict[str, tuple[datetime, str | None]] = {}
+    # 最早一条未写入记录的登记时间（monotonic），用于计算刷新延迟
+    _pending_since: float | None = None
+    _task: asyncio.Task | None = None
+    _lock: asyncio.Lock | None = None
+    _last_flush_at: float | None = None
+    _last_flush_lag = 0.0
+    _last_flush_rows = 0
+    _flush_errors = 0
+
+    @classmethod
+    def add(cls, conversation_id: str, last_active_at: datetime, title: str | None = None):
+        previous = cls._pending.get(conversation_id)
+        if title is None and previous is not None:
+            title = previous[1]
+        cls._pending[conversation_id] = (last_active_at, title)
+        if cls._pending_since is None:
+            cls._pending_since = time.monotonic()
+
+    @classmethod
+    async def flush(cls):
+        if cls._lock is None:
+            cls._lock = asyncio.Lock()
+        async with cls._lock:
+            if not cls._pending:
+                return
+            batch, cls._pending = cls._pending, {}
+            pending_since, cls._pending_since = cls._pending_since, None
+            items = list(batch.items())
+            try:
+                async with db_connection() as db:
+                    for i in range(0, len(items), cls._BATCH_SIZE):
+                        await db.execute(cls._bulk_update(items[i:i + cls._BATCH_SIZE]))
+                    await db.commit()
+            except Exception as e:  # pylint: disable=broad-except
+                cls._flush_errors += 1
+                logger.warning(f'[ConversationWriteBehind] flush of {len(items)} conversations failed, will retry: {e}')
+                # 放回缓冲区，期间新登记的值更新，保留新值
+                for conversation_id, value in items:
+                    cls._pending.setdefault(conversation_id, value)
+                if cls._pending_since is None or (pending_since is not None and pending_since < cls._pending_since):
+                    cls._pending_since = pending_since
+                return
+
+            cls._last_flush_at = time.time()
+            cls._last_flush_rows = len(items)
+            cls._last_flush_lag = time.monotonic() - pending_since if pending_since is not None else 0.0
+            if cls._last_flush_lag > tagentic_config.CONVERSATION_WRITE_BEHIND_INTERVAL * 5:
+                logger.warning(
+                    f'[ConversationWriteBehind] flushed {len(items)} conversations, lag {cls._last_flush_lag:.1f}s'
+                )
+
+    @staticmethod
+    def _bulk_update(items: list[tuple[str, tuple[datetime, str | None]]]):
+        # 参数统一以字符串传入并在 SQL 中显式转换，避免 VALUES 中参数类型推断不一致
+        rows = values(
+            column('Id', String),
+            column('LastActiveAt', String),
+            column('Title', String),
+            name='pending',
+        ).data([
+            (conversation_id, last_active_at.isoformat(), title)
+            for conversation_id, (last_active_at, title) in items
+        ])
+        return (
+            update(ChatConversation)
+            .where(ChatConversation.Id == cast(rows.c.Id, UUID()))
+            .values(
+                LastActiveAt=cast(rows.c.LastActiveAt, DateTime),
+                Title=func.coalesce(rows.c.Title, ChatConversation.Title),
+            )
+        )
+
+    @classmethod
+    async def _run(cls):
+        while True:
+            await asyncio.sleep(tagentic_config.CONVERSATION_WRITE_BEHIND_INTERVAL)
+            try:
+                await cls.flush()
+            except Exception as e:  # pylint: disable=broad-except
+                logger.warning(f'[ConversationWriteBehind] unexpected flush error: {e}')
+
+    @classmethod
+    def start(cls):
+        if cls._task is None or cls._task.done():
+            cls._task = asyncio.create_task(cls._run())
+
+    @classmethod
+    async def stop(cls):
+        if cls._task is not None:
+            cls._task.cancel()
+            await asyncio.gather(cls._task, return_exceptions=True)
+            cls._task = None
+        await cls.flush()
+
+    @classmethod
+    def stats(cls) -> dict:
+        return {
+            'pending': len(cls._pending),
+            'pending_age': time.monotonic() - cls._pending_since if cls._pending_since is not None else 0.0,
+            'last_flush_at': cls._last_flush_at,
+            'last_flush_rows': cls._last_flush_rows,
+            'last_flush_lag': cls._last_flush_lag,
+            'flush_errors': cls._flush_errors,
+        }
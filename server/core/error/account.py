@@ -18,3 +18,9 @@ class CustomerAccountSign(BaseError):
     def __init__(self, description: Optional[str] = None):
         super().__init__(description)
         self.status_code = 403
+
+
+class AccountForbidden(BaseError):
+    def __init__(self, description: Optional[str] = None):
+        super().__init__(description)
+        self.status_code = 403
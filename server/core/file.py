@@ -0,0 +1,124 @@
+"""
+上传文件的内容哈希索引
+
+同一文件（SHA-256 相同）再次上传且预先声明了哈希时，直接返回已上传对象的 Url / CosUrl / CosBucket，
+不再申请存储凭证和上传 COS；未声明哈希的请求体总会上传，返回本次上传的对象并让索引指向它。实时文档解析的 doc_id 与会话绑定，不记录在这里，由 /file/parse 的解析缓存负责。
+
+- 去重范围由 FILE_DEDUPE_SCOPE 决定：account 只在同一账户内复用，application 在同一应用内复用；
+- 客户端声明、未经服务端校验的哈希（上传前查询、直传完成时记录）始终只在本账户内匹配，
+  否则知道某个文件哈希的人即可取得其他账户的文件；application 范围只用于服务端边上传边计算的哈希；
+- 记录在 FILE_DEDUPE_TTL 后失效，应不长于实时文件桶中对象的生命周期；
+- claw 模式返回的是有时效的下载地址，不参与去重。
+"""
+import logging
+import re
+from datetime import UTC, datetime, timedelta
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import tagentic_config
+from model.file import FileUploadIndex
+
+logger = logging.getLogger(__name__)
+
+_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+
+class CoreFileIndex:
+
+    @staticmethod
+    def enabled(mode: str = 'standard') -> bool:
+        return tagentic_config.FILE_DEDUPE_TTL > 0 and mode != 'claw'
+
+    @staticmethod
+    def normalize_hash(sha256: str | None) -> str | None:
+        """客户端传入的十六进制 SHA-256，格式不合法时视为未提供"""
+        sha256 = (sha256 or '').strip().lower()
+        return sha256 if _SHA256.match(sha256) else None
+
+    @staticmethod
+    def scope(application_id: str, account_id: str, trusted: bool = True) -> str:
+        """trusted 为 False（哈希由客户端声明）时不论 FILE_DEDUPE_SCOPE 都限定在本账户内"""
+        if trusted and tagentic_config.FILE_DEDUPE_SCOPE == 'application':
+            return application_id
+        return f'{application_id}/{account_id}'
+
+    @staticmethod
+    def _scopes(application_id: str, account_id: str, trusted: bool = True) -> list[str]:
+        # 账户范围总是记录，使本账户之后以声明的哈希查询时也能命中
+        return list(dict.fromkeys((
+            CoreFileIndex.scope(application_id, account_id, trusted),
+            CoreFileIndex.scope(application_id, account_id, trusted=False),
+        )))
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(UTC).replace(tzinfo=None)
+
+    @staticmethod
+    async def lookup(
+        db: AsyncSession,
+        application_id: str,
+        account_id: str,
+        sha256: str,
+        trusted: bool = False,
+    ) -> dict | None:
+        """命中时返回与上传接口相同格式的结果，否则返回 None
+
+        trusted 表示哈希由服务端根据实际内容计算；客户端声明的哈希只查本账户的记录。
+        """
+        row = (await db.execute(
+            select(FileUploadIndex).where(
+                FileUploadIndex.Scope == CoreFileIndex.scope(application_id, account_id, trusted),
+                FileUploadIndex.Sha256 == sha256,
+                FileUploadIndex.ExpiresAt > CoreFileIndex._now(),
+            )
+        )).scalar()
+        if row is None:
+            return None
+        logger.info(f'[CoreFileIndex] dedupe hit: {row.CosUrl}')
+        return {
+            'Url': row.Url,
+            'CosUrl': row.CosUrl,
+            'CosBucket': row.CosBucket,
+            'Sha256': sha256,
+            'Size': row.Size,
+            'Duplicate': True,
+        }
+
+    @staticmethod
+    async def record(
+        db: AsyncSession,
+        application_id: str,
+        account_id: str,
+        sha256: str,
+        size: int,
+        result: dict,
+        trusted: bool = False,
+    ):
+        """记录一次上传结果，由调用方提交事务；同一哈希重新上传时覆盖旧记录
+
+        trusted 为 False 时只写入本账户范围，不会被其他账户命中。
+        """
+        scopes = CoreFileIndex._scopes(application_id, account_id, trusted)
+        now = CoreFileIndex._now()
+        values = {
+            'Url': result['Url'],
+            'CosUrl': result.get('CosUrl', ''),
+            'CosBucket': result.get('CosBucket', ''),
+            'Size': size,
+            'CreatedAt': now,
+            'ExpiresAt': now + timedelta(seconds=tagentic_config.FILE_DEDUPE_TTL),
+        }
+        # 顺带清理这些范围内已过期的记录
+        await db.execute(delete(FileUploadIndex).where(
+            FileUploadIndex.Scope.in_(scopes),
+            FileUploadIndex.ExpiresAt <= now,
+        ))
+        await db.execute(insert(FileUploadIndex).values([
+            {'Scope': scope, 'Sha256': sha256, **values} for scope in scopes
+        ]).on_conflict_do_update(
+            index_elements=[FileUploadIndex.Scope, FileUploadIndex.Sha256],
+            set_=values,
+        ))
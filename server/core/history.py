@@ -0,0 +1,299 @@
+"""
+TCADP 会话历史的本地副本
+
+每轮对话经本服务中转时，request_ack（用户问题）与 response.completed（完整回复）事件里
+已经带着完整的 V2 Record，ChatHistoryCapture 在转发的同时把它们收集起来，
+对话结束后写入 chat_history_record 表。
+
+chat_history_state 记录一个会话的本地历史是否完整：
+- 从第一轮起就经本服务中转的会话，本地即完整（Source=relay）；
+- 在其他地方创建 / 历史有缺口（某一轮未完整收集）的会话标记为不完整，
+  /chat/messages 回源上游，并在后台把上游历史回填到本地，回填完成后标记为完整。
+
+本地完整的会话打开时不再请求上游 GetMsgRecord / DescribeConversationMessageList。
+
+SSE 中收集的 Record 与 DescribeConversationMessageList（claw 模式）返回的一致，
+GetMsgRecord（standard 模式）返回的还带有上游的旧版字段，只能由回填得到：
+读取时本地的来源必须与调用方使用的上游接口相符，否则回源上游。
+"""
+import asyncio
+import logging
+import uuid
+from typing import Awaitable, Callable
+from sqlalchemy import select, delete, update, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import tagentic_config
+from model.chat import ChatHistoryRecord, ChatHistoryState
+from util.cache import LRUCache
+from util.database import db_connection
+from vendor.interface import EventType, RecordRole
+
+logger = logging.getLogger(__name__)
+
+SOURCE_RELAY = 'relay'
+# 与 SSE 中收集的 Record 格式一致的上游历史接口
+RELAY_EQUIVALENT_SOURCES = ('DescribeConversationMessageList',)
+
+# 拉取上游一页历史：参数为 LastRecordId（None 表示最新一页），返回 (按时间升序的 records, 是否还有更早的记录)
+FetchPage = Callable[[str | None], Awaitable[tuple[list[dict], bool]]]
+
+
+class ChatHistoryCapture:
+    """收集一轮对话中 request_ack / response.completed 携带的完整 Record"""
+
+    def __init__(self, conversation_id: str, is_new_conversation: bool):
+        self.conversation_id = conversation_id
+        self.is_new_conversation = is_new_conversation
+        self.records: dict[str, dict] = {}
+
+    def feed(self, event: dict):
+        event_type = event.get('Type')
+        if event_type == EventType.REQUEST_ACK.value:
+            record = event.get('RequestAck')
+        elif event_type == EventType.RESPONSE_COMPLETED.value:
+            record = event.get('Response')
+        else:
+            return
+        if isinstance(record, dict) and record.get('RecordId'):
+            self.records[record['RecordId']] = record
+
+    def turn(self) -> list[dict] | None:
+        """完整的一轮：用户问题与回复都已收到且带 Messages，否则返回 None"""
+        roles = {record.get('Role') for record in self.records.values() if record.get('Messages')}
+        if RecordRole.USER.value not in roles or RecordRole.ASSISTANT.value not in roles:
+            return None
+        return list(self.records.values())
+
+
+class CoreChatHistory:
+    # 同一 worker 内正在回填的会话，避免重复回填
+    _backfilling: set[str] = set()
+    _tasks: set[asyncio.Task] = set()
+    # 每个会话在 CHAT_HISTORY_BACKFILL_INTERVAL 内最多回填一次（含超出 CHAT_HISTORY_BACKFILL_MAX_RECORDS 的会话）
+    _attempted = LRUCache(maxsize=10000, ttl=tagentic_config.CHAT_HISTORY_BACKFILL_INTERVAL)
+
+    @staticmethod
+    async def load(
+        db: AsyncSession,
+        conversation_id: str,
+        source: str,
+        limit: int,
+        last_record_id: str = None,
+    ) -> tuple[list[dict], bool] | None:
+        """从本地读取一页历史（LastRecordId 之前的最多 limit 条，按时间升序）及是否还有更早的记录
+
+        本地历史不完整、或 LastRecordId 不在本地时返回 None，由调用方回源上游。
+        """
+        state = (await db.execute(
+            select(ChatHistoryState).where(ChatHistoryState.ConversationId == conversation_id)
+        )).scalar()
+        if state is None or not state.Complete or not CoreChatHistory._serves(state.Source, source):
+            return None
+
+        query = select(ChatHistoryRecord.Record).where(ChatHistoryRecord.ConversationId == conversation_id)
+        if last_record_id:
+            seq = (await db.execute(select(ChatHistoryRecord.Seq).where(
+                ChatHistoryRecord.ConversationId == conversation_id,
+                ChatHistoryRecord.RecordId == last_record_id,
+            ))).scalar()
+            if seq is None:
+                return None
+            query = query.where(ChatHistoryRecord.Seq < seq)
+        rows = (await db.execute(
+            query.order_by(ChatHistoryRecord.Seq.desc()).limit(limit + 1)
+        )).scalars().all()
+        has_more = len(rows) > limit
+        return list(reversed(rows[:limit])), has_more
+
+    @staticmethod
+    def _serves(stored_source: str, source: str) -> bool:
+        """来源为 stored_source 的本地历史能否代替上游接口 source 的返回"""
+        if stored_source == source:
+            return True
+        return stored_source == SOURCE_RELAY and source in RELAY_EQUIVALENT_SOURCES
+
+    @staticmethod
+    async def get_records(
+        db: AsyncSession, conversation_id: str, source: str, record_ids: list[str],
+    ) -> list[dict] | None:
+        """按 RecordId 读取本地记录（按时间升序），本地历史不完整或来源不符时返回 None"""
+        state = (await db.execute(
+            select(ChatHistoryState).where(ChatHistoryState.ConversationId == conversation_id)
+        )).scalar()
+        if state is None or not state.Complete or not CoreChatHistory._serves(state.Source, source):
+            return None
+        return list((await db.execute(
+            select(ChatHistoryRecord.Record)
+            .where(ChatHistoryRecord.ConversationId == conversation_id, ChatHistoryRecord.RecordId.in_(record_ids))
+            .order_by(ChatHistoryRecord.Seq)
+        )).scalars().all())
+
+    @staticmethod
+    async def save_turn(capture: ChatHistoryCapture):
+        """对话结束后写入本轮记录；本轮不完整时把会话标记为有缺口"""
+        records = capture.turn()
+        conversation_id = capture.conversation_id
+        async with db_connection() as db:
+            if records is None:
+                logger.info(
+                    f'[CoreChatHistory] incomplete turn in conversation {conversation_id}, local history invalidated'
+                )
+                await CoreChatHistory._invalidate(db, conversation_id)
+            elif capture.is_new_conversation:
+                await db.execute(insert(ChatHistoryState).values(
+                    ConversationId=conversation_id,
+                    Complete=True,
+                    Source=SOURCE_RELAY,
+                ).on_conflict_do_nothing())
+                await CoreChatHistory._append(db, conversation_id, records)
+            else:
+                # 从 GetMsgRecord 回填的历史与收集到的 Record 格式不同，不混写，同样视为有缺口
+                complete = (await db.execute(
+                    update(ChatHistoryState)
+                    .where(
+                        ChatHistoryState.ConversationId == conversation_id,
+                        ChatHistoryState.Complete.is_(True),
+                        ChatHistoryState.Source.in_((SOURCE_RELAY, *RELAY_EQUIVALENT_SOURCES)),
+                    )
+                    .values(UpdatedAt=func.current_timestamp())
+                    .returning(ChatHistoryState.ConversationId)
+                )).scalar()
+                if complete is not None:
+                    await CoreChatHistory._append(db, conversation_id, records)
+                else:
+                    # 本地尚不完整：不写入，只让进行中的回填作废（其快照可能缺少本轮）
+                    await CoreChatHistory._invalidate(db, conversation_id)
+            await db.commit()
+
+    @staticmethod
+    async def invalidate(conversation_id: str):
+        async with db_connection() as db:
+            await CoreChatHistory._invalidate(db, conversation_id)
+            await db.commit()
+
+    @classmethod
+    def schedule_invalidate(cls, conversation_id: str):
+        """无法等待写库时（如生成被取消）在后台标记缺口"""
+        task = asyncio.create_task(cls._invalidate_quietly(conversation_id))
+        cls._tasks.add(task)
+        task.add_done_callback(cls._tasks.discard)
+
+    @staticmethod
+    async def _invalidate_quietly(conversation_id: str):
+        try:
+            await CoreChatHistory.invalidate(conversation_id)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning(f'[CoreChatHistory] failed to invalidate conversation {conversation_id}: {e}')
+
+    @staticmethod
+    async def _invalidate(db: AsyncSession, conversation_id: str):
+        await db.execute(
+            update(ChatHistoryState)
+            .where(ChatHistoryState.ConversationId == conversation_id)
+            .values(Complete=False, BackfillToken=None, UpdatedAt=func.current_timestamp())
+        )
+
+    @staticmethod
+    async def _append(db: AsyncSession, conversation_id: str, records: list[dict]):
+        await db.execute(insert(ChatHistoryRecord).values([
+            {'ConversationId': conversation_id, 'RecordId': record['RecordId'], 'Record': record}
+            for record in records
+        ]).on_conflict_do_nothing())
+
+    @staticmethod
+    async def set_score(db: AsyncSession, conversation_id: str, record_id: str, score: int):
+        """评价结果写入本地 Record 的 Score（与上游历史接口返回的字段一致），由调用方提交事务"""
+        await db.execute(
+            update(ChatHistoryRecord)
+            .where(ChatHistoryRecord.ConversationId == conversation_id, ChatHistoryRecord.RecordId == record_id)
+            .values(Record=ChatHistoryRecord.Record.op('||')(func.jsonb_build_object('Score', score)))
+        )
+
+    @staticmethod
+    async def delete(db: AsyncSession, conversation_id: str):
+        """随会话一起删除本地历史，由调用方提交事务"""
+        await db.execute(delete(ChatHistoryRecord).where(ChatHistoryRecord.ConversationId == conversation_id))
+        await db.execute(delete(ChatHistoryState).where(ChatHistoryState.ConversationId == conversation_id))
+
+    @classmethod
+    def schedule_backfill(
+        cls,
+        conversation_id: str,
+        source: str,
+        fetch_page: FetchPage,
+    ):
+        """在后台把该会话的完整上游历史回填到本地"""
+        disabled = tagentic_config.CHAT_HISTORY_BACKFILL_MAX_RECORDS == 0
+        if disabled or conversation_id in cls._backfilling or conversation_id in cls._attempted:
+            return
+        cls._backfilling.add(conversation_id)
+        cls._attempted.set(conversation_id, True)
+        task = asyncio.create_task(cls._backfill(conversation_id, source, fetch_page))
+        cls._tasks.add(task)
+        task.add_done_callback(cls._tasks.discard)
+
+    @classmethod
+    async def _backfill(
+        cls,
+        conversation_id: str,
+        source: str,
+        fetch_page: FetchPage,
+    ):
+        try:
+            token = uuid.uuid4()
+            async with db_connection() as db:
+                await db.execute(insert(ChatHistoryState).values(
+                    ConversationId=conversation_id,
+                    Complete=False,
+                    Source=source,
+                    BackfillToken=token,
+                ).on_conflict_do_update(
+                    index_elements=[ChatHistoryState.ConversationId],
+                    set_={'Complete': False, 'Source': source, 'BackfillToken': token,
+                          'UpdatedAt': func.current_timestamp()},
+                ))
+                await db.commit()
+
+            # 登记 token 之后才开始拉取：此后结束的对话会使 token 失效，不会漏掉任何一轮
+            records, has_more = await fetch_page(None)
+            pages = [records]
+            total = len(records)
+            while has_more and records:
+                if total >= tagentic_config.CHAT_HISTORY_BACKFILL_MAX_RECORDS:
+                    logger.info(
+                        f'[CoreChatHistory] conversation {conversation_id} exceeds backfill limit, '
+                        'keep loading from upstream'
+                    )
+                    return
+                records, has_more = await fetch_page(records[0]['RecordId'])
+                pages.append(records)
+                total += len(records)
+
+            history: dict[str, dict] = {}
+            for page in reversed(pages):
+                for record in page:
+                    if record.get('RecordId'):
+                        history.setdefault(record['RecordId'], record)
+
+            async with db_connection() as db:
+                done = (await db.execute(
+                    update(ChatHistoryState)
+                    .where(ChatHistoryState.ConversationId == conversation_id, ChatHistoryState.BackfillToken == token)
+                    .values(Complete=True, BackfillToken=None, UpdatedAt=func.current_timestamp())
+                    .returning(ChatHistoryState.ConversationId)
+                )).scalar()
+                if done is None:
+                    logger.info(f'[CoreChatHistory] backfill of conversation {conversation_id} superseded')
+                    await db.rollback()
+                    return
+                await db.execute(delete(ChatHistoryRecord).where(ChatHistoryRecord.ConversationId == conversation_id))
+                if history:
+                    await CoreChatHistory._append(db, conversation_id, list(history.values()))
+                await db.commit()
+            logger.info(f'[CoreChatHistory] backfilled {len(history)} records of conversation {conversation_id}')
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning(f'[CoreChatHistory] backfill of conversation {conversation_id} failed: {e}')
+        finally:
+            cls._backfilling.discard(conversation_id)
@@ -3,10 +3,12 @@ from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.ext.asyncio import AsyncSession
 from asyncpg.exceptions import InvalidCatalogNameError
 from sqlalchemy import inspect
+from sqlalchemy.schema import CreateIndex
 from sqlalchemy.sql import text
 from model.account import Account
-from model.chat import ChatRecord, ChatConversation, SharedConversation
+from model.chat import ChatRecord, ChatConversation, SharedConversation, ChatHistoryRecord, ChatHistoryState
 from model.agent import AgentConfig
+from model.file import FileUploadIndex
 from util.database import create_db_engine, connect_with_retry
 
 from app_factory import TAgenticApp
@@ -58,7 +60,10 @@ class Migration:
             ChatRecord,
             ChatConversation,
             SharedConversation,
+            ChatHistoryRecord,
+            ChatHistoryState,
             AgentConfig,
+            FileUploadIndex,
         ]
 
     @staticmethod
@@ -84,6 +89,33 @@ class Migration:
         await conn.close()
         logging.info('Migration done')
 
+    @staticmethod
+    def upgrade_steps() -> list:
+        """已有库的增量变更，每次启动都会执行，必须是幂等的"""
+        return [
+            CreateIndex(index, if_not_exists=True)
+            for index in ChatConversation.__table__.indexes
+            if index.name in (
+                'ix_chat_conversation_account_app_active',
+                'ix_chat_conversation_account_active',
+            )
+        ] + [
+            text('ALTER TABLE shared_conversation ADD COLUMN IF NOT EXISTS "References" JSON'),
+        ]
+
+    @staticmethod
+    async def upgrade(db: AsyncSession):
+        conn = await connect_with_retry(db)
+        for step in Migration.upgrade_steps():
+            try:
+                await conn.run_sync(lambda connection: connection.execute(step))
+                await conn.commit()
+            except Exception as e:  # pylint: disable=broad-except
+                # 多个 worker 同时启动时可能并发执行同一变更，失败不影响服务启动
+                logging.warning(f"[Migration.upgrade] {step}: {e}")
+                await conn.rollback()
+        await conn.close()
+
     @staticmethod
     async def init(db: AsyncSession, app: TAgenticApp):
         # 检查数据库和表是否已初始化
@@ -92,3 +124,4 @@ class Migration:
             logging.warning(f"[SetupInitApi] need to create tables: {tbls}")
             # 初始化数据库和表
             await Migration.init_table(db, app)
+        await Migration.upgrade(db)
@@ -1,4 +1,5 @@
 from config import tagentic_config
+from util.cache import LRUCache
 import jwt
 
 from core.error.account import (
@@ -7,17 +8,25 @@ from core.error.account import (
 
 
 class SessionToken:
+    # 已验证的 token -> claims，按 token 自身的 exp 过期；命中时跳过 HS256 验签
+    _verified = LRUCache(maxsize=tagentic_config.SESSION_TOKEN_CACHE_SIZE, ttl=tagentic_config.SESSION_TOKEN_CACHE_TTL)
+
     @staticmethod
     def create(payload):
         return jwt.encode(payload, tagentic_config.SECRET_KEY, algorithm="HS256")
 
     @staticmethod
     def check(token):
+        claims = SessionToken._verified.get(token)
+        if claims is not None:
+            return claims
         try:
-            return jwt.decode(token, tagentic_config.SECRET_KEY, algorithms=["HS256"])
+            claims = jwt.decode(token, tagentic_config.SECRET_KEY, algorithms=["HS256"])
         except jwt.exceptions.InvalidSignatureError:
             raise AccountUnauthorized("Invalid token signature.")
         except jwt.exceptions.DecodeError:
             raise AccountUnauthorized("Invalid token.")
         except jwt.exceptions.ExpiredSignatureError:
             raise AccountUnauthorized("Token has expired.")
+        SessionToken._verified.set(token, claims, expires_at=claims.get('exp'))
+        return claims
@@ -1,16 +1,105 @@
+import logging
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from model.chat import SharedConversation
+from util.database import db_connection
+from vendor.interface import BaseVendor
+
+
+def _record_id(record) -> str:
+    return record.RecordId if hasattr(record, 'RecordId') else record.get("RecordId")
 
 
 class CoreShareConversation:
 
+    @staticmethod
+    async def collect_records(
+        vendor_app: BaseVendor,
+        account_id: str,
+        conversation_id: str,
+        record_ids: list[str],
+        page_size: int,
+    ) -> list[dict]:
+        """从会话历史中取出要分享的记录，按时间顺序返回
+
+        - vendor 支持按 RecordId 直接获取（get_messages_by_ids）且全部命中时，不再翻页；
+        - 否则从最新一页开始往前翻，找齐所有 RecordId、或已到最早一页时停止。
+
+        不使用请求的数据库会话：每次读取各自短暂签出连接，翻页拉取上游期间不占用连接。
+        """
+        wanted = set(record_ids)
+        if hasattr(vendor_app, 'get_messages_by_ids'):
+            async with db_connection() as db:
+                records = await vendor_app.get_messages_by_ids(db, account_id, conversation_id, list(wanted))
+            if records is not None and {_record_id(record) for record in records} >= wanted:
+                return [record.model_dump() if hasattr(record, 'model_dump') else record for record in records]
+
+        pages = []
+        found = set()
+        last_record_id = None
+        while found < wanted:
+            async with db_connection() as db:
+                page = await vendor_app.get_messages(
+                    db, account_id, conversation_id, page_size, last_record_id=last_record_id
+                )
+            if not page:
+                break
+            pages.append([record for record in page if _record_id(record) in wanted])
+            found.update(_record_id(record) for record in pages[-1])
+            first_record_id = _record_id(page[0])
+            if len(page) < page_size or first_record_id == last_record_id:
+                break
+            last_record_id = first_record_id
+
+        return [
+            record.model_dump() if hasattr(record, 'model_dump') else record
+            for page in reversed(pages)
+            for record in page
+        ]
+
+    @staticmethod
+    def reference_ids(records: list[dict]) -> list[str]:
+        """记录中需要补充详情的引用（Type=2）Id，与前端 collectType2References 一致"""
+        reference_ids = []
+        for record in records:
+            for message in record.get('Messages') or []:
+                for content in (message or {}).get('Contents') or []:
+                    for reference in (content or {}).get('References') or []:
+                        if not reference or reference.get('Type') != 2:
+                            continue
+                        reference_id = (
+                            reference.get('Id') or
+                            reference.get('ReferBizId') or
+                            (reference.get('DocRefer') or {}).get('ReferBizId') or
+                            (reference.get('QaRefer') or {}).get('ReferBizId')
+                        )
+                        if reference_id and reference_id not in reference_ids:
+                            reference_ids.append(reference_id)
+        return reference_ids
+
+    @staticmethod
+    async def prefetch_references(vendor_app: BaseVendor, account_id: str, records: list[dict]) -> dict | None:
+        """分享时预取引用详情，失败时返回 None，分享页查看引用时再回源"""
+        reference_ids = CoreShareConversation.reference_ids(records)
+        if not reference_ids:
+            return {}
+        if not hasattr(vendor_app, 'get_reference_details'):
+            return None
+        try:
+            details = await vendor_app.get_reference_details(account_id, reference_ids)
+        except Exception as e:  # pylint: disable=broad-except
+            logging.warning(f'[CoreShareConversation] failed to prefetch {len(reference_ids)} references: {e}')
+            return None
+        return {detail.get('Id') or detail.get('ReferBizId'): detail for detail in details}
+
     @staticmethod
     async def create(
-        db: AsyncSession, account_id: str, conversation_id: str, application_id: str, records: list
+        db: AsyncSession, account_id: str, conversation_id: str, application_id: str, records: list,
+        references: dict | None = None,
     ) -> SharedConversation:
         shared = SharedConversation(
-            AccountId=account_id, ApplicationId=application_id, ParentConversationId=conversation_id, Records=records
+            AccountId=account_id, ApplicationId=application_id, ParentConversationId=conversation_id, Records=records,
+            References=references,
         )
         db.add(shared)
         await db.commit()
@@ -0,0 +1,445 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+import uuid
+from collections import OrderedDict, deque
+from itertools import islice
+from typing import AsyncGenerator, AsyncIterator
+
+from config import tagentic_config
+from util.helper import sniff_event_type, to_event
+from vendor.interface import BaseVendor, ErrorInfo, EventType
+
+logger = logging.getLogger(__name__)
+
+
+# text.delta 帧是扁平的 JSON 对象；字符串内容中的引号总是被转义，"Key": 只会匹配到真正的键
+_DELTA_TEXT_PATTERN = re.compile(rb'"Text"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_DELTA_KEY_PATTERNS = (
+    re.compile(rb'"MessageId"\s*:\s*("(?:[^"\\]|\\.)*"|null)'),
+    re.compile(rb'"ContentIndex"\s*:\s*(-?\d+|null)'),
+)
+
+
+class _DeltaBuffer:
+    """按字节拼接同一 MessageId / ContentIndex 的 text.delta 帧
+
+    不解析 JSON：保留第一帧 Text 值之前 / 之后的字节，把后续帧 Text 的转义字符串原样拼接在中间。
+    """
+
+    def __init__(self, frame: bytes, key: tuple, match: re.Match):
+        self.key = key
+        self.prefix = frame[:match.start(1)]
+        self.suffix = frame[match.end(1):]
+        self.texts = [match.group(1)]
+        self.size = len(match.group(1))
+
+    @staticmethod
+    def parse(frame: bytes) -> tuple[tuple, re.Match] | None:
+        """frame 为单个 text.delta 帧时返回 (合并 key, Text 的匹配)，否则返回 None"""
+        if not isinstance(frame, (bytes, bytearray)) or not frame.startswith(b'data:'):
+            return None
+        if sniff_event_type(frame) != EventType.TEXT_DELTA.value:
+            return None
+        # 一个 chunk 内包含多个帧时不做合并
+        if b'\n' in frame.rstrip(b'\r\n'):
+            return None
+        match = _DELTA_TEXT_PATTERN.search(frame)
+        if match is None:
+            return None
+        key = tuple(
+            found.group(1) if (found := pattern.search(frame)) else None
+            for pattern in _DELTA_KEY_PATTERNS
+        )
+        return key, match
+
+    def append(self, match: re.Match):
+        self.texts.append(match.group(1))
+        self.size += len(match.group(1))
+
+    def to_frame(self) -> bytes:
+        return self.prefix + b''.join(self.texts) + self.suffix
+
+
+_SOURCE_END = object()
+
+
+class CoreStream:
+    @staticmethod
+    def coalesce_options(vendor_app: BaseVendor) -> tuple[int, int]:
+        """从 APP_CONFIGS 读取合并窗口：DeltaCoalesceMs（0 表示关闭）与 DeltaCoalesceBytes（0 表示不限）"""
+        config = getattr(vendor_app, 'config', None) or {}
+        try:
+            window_ms = int(config.get('DeltaCoalesceMs', 0) or 0)
+            max_bytes = int(config.get('DeltaCoalesceBytes', 0) or 0)
+        except (TypeError, ValueError):
+            logger.warning(
+                f'[CoreStream] invalid DeltaCoalesce config: '
+                f'{config.get("DeltaCoalesceMs")!r}, {config.get("DeltaCoalesceBytes")!r}'
+            )
+            return 0, 0
+        return max(window_ms, 0), max(max_bytes, 0)
+
+    @staticmethod
+    async def coalesce(
+        source: AsyncGenerator[bytes, None],
+        window_ms: int,
+        max_bytes: int = 0,
+    ) -> AsyncIterator[bytes]:
+        """合并相邻的 text.delta 帧
+
+        同一 MessageId / ContentIndex 的连续 text.delta 在 window_ms 毫秒内（或累计的 Text 转义后字节数达到 max_bytes）
+        合并为一帧输出；遇到任何非 text.delta 帧时先输出已缓冲的文本，再原样转发该帧。
+        window_ms <= 0 时不做任何处理。
+        """
+        if window_ms <= 0:
+            async for frame in source:
+                yield frame
+            return
+
+        loop = asyncio.get_running_loop()
+        window = window_ms / 1000
+        # 单个常驻任务读取上游，按帧放入队列；等待合并窗口超时只取消 queue.get，不会打断上游生成器
+        queue: asyncio.Queue = asyncio.Queue(maxsize=256)
+
+        async def read():
+            try:
+                async for item in source:
+                    await queue.put(item)
+                await queue.put(_SOURCE_END)
+            except Exception as e:  # pylint: disable=broad-except
+                await queue.put(e)
+
+        reader = asyncio.create_task(read())
+        buffer: _DeltaBuffer | None = None
+        deadline = 0.0
+        try:
+            while True:
+                if buffer is None:
+                    frame = await queue.get()
+                else:
+                    try:
+                        frame = await asyncio.wait_for(queue.get(), max(deadline - loop.time(), 0))
+                    except asyncio.TimeoutError:
+                        yield buffer.to_frame()
+                        buffer = None
+                        continue
+
+                if frame is _SOURCE_END:
+                    break
+                if isinstance(frame, Exception):
+                    raise frame
+
+                delta = _DeltaBuffer.parse(frame)
+                if delta is None:
+                    if buffer is not None:
+                        yield buffer.to_frame()
+                        buffer = None
+                    yield frame
+                    continue
+
+                key, match = delta
+                if buffer is not None and buffer.key == key:
+                    buffer.append(match)
+                else:
+                    if buffer is not None:
+                        yield buffer.to_frame()
+                    buffer = _DeltaBuffer(frame, key, match)
+                    deadline = loop.time() + window
+
+                if max_bytes and buffer.size >= max_bytes:
+                    yield buffer.to_frame()
+                    buffer = None
+
+            if buffer is not None:
+                yield buffer.to_frame()
+        finally:
+            reader.cancel()
+            await asyncio.gather(reader, return_exceptions=True)
+            await source.aclose()
+
+
+class ChatStream:
+    """一次进行中的对话生成
+
+    上游事件按序编号（SSE id），保存在有界的环形缓冲区中，订阅者各自按游标读取，
+    因此客户端断线后可凭 Last-Event-ID 续读，多个订阅者共享同一条上游连接，生成本身不受订阅者影响。
+    """
+
+    def __init__(self, account_id: str, request_hash: str | None = None):
+        self.id = uuid.uuid4().hex
+        self.account_id = account_id
+        self.conversation_id: str | None = None
+        # 发起这次生成的请求内容摘要，重发的请求与之一致时才接入
+        self.request_hash = request_hash
+        self.created_at = time.time()
+        self.events: deque[bytes] = deque()
+        # events[0] 的序号；序号从 1 开始，与 SSE id 一致
+        self.first_seq = 1
+        self.next_seq = 1
+        self.size = 0
+        self.done = False
+        self.subscribers = 0
+        self.condition = asyncio.Condition()
+        self.producer: asyncio.Task | None = None
+        self.grace_handle: asyncio.TimerHandle | None = None
+
+    @property
+    def last_event_id(self) -> int:
+        return self.next_seq - 1
+
+
+class CoreChatStream:
+    """进行中对话的注册表（进程内，按 worker 隔离）
+
+    - 客户端断开后生成继续进行 CHAT_STREAM_GRACE_PERIOD 秒，期间可通过 /chat/message/resume 续读；
+      超时仍无订阅者则取消生成（同时关闭上游 SSE）。用户主动停止时经 /chat/message/stop 立即取消
+    - 生成结束后事件再保留 CHAT_STREAM_GRACE_PERIOD 秒，供断线的客户端补齐尾部
+    - 单个流最多缓存 CHAT_STREAM_BUFFER_BYTES，所有流合计最多 CHAT_STREAM_TOTAL_BUFFER_BYTES，
+      超出时优先淘汰已结束的流，再从最旧的流头部淘汰事件
+    """
+
+    _streams: OrderedDict[str, ChatStream] = OrderedDict()
+    _by_conversation: dict[str, str] = {}
+    _total_size = 0
+    _tasks: set[asyncio.Task] = set()
+
+    @staticmethod
+    def request_hash(*parts) -> str:
+        """请求内容的摘要，用于判断重发的消息是否就是进行中的那一次"""
+        raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def start(
+        cls, account_id: str, source_factory, conversation_id: str = None, request_hash: str = None,
+    ) -> ChatStream:
+        """注册并在后台启动一次生成
+
+        Args:
+            source_factory: 接收 ChatStream、返回事件生成器的函数，
+                生成器应在会话 Id 确定后调用 bind_conversation 绑定
+            conversation_id: 已有会话的 Id，启动前即绑定，使随后的重复请求能找到这次生成
+            request_hash: 请求内容摘要（见 request_hash），重发的请求据此判断能否接入
+        """
+        stream = ChatStream(account_id, request_hash)
+        cls._streams[stream.id] = stream
+        if conversation_id:
+            cls.bind_conversation(stream, conversation_id)
+        stream.producer = asyncio.create_task(cls._produce(stream, source_factory(stream)))
+        stream.producer.add_done_callback(lambda _: cls._on_producer_done(stream))
+        # 在第一个订阅者接入前同样适用宽限期，避免无人消费的生成一直占用上游
+        if tagentic_config.CHAT_STREAM_GRACE_PERIOD > 0:
+            cls._schedule_grace(stream)
+        return stream
+
+    @classmethod
+    def attach_or_start(
+        cls, account_id: str, source_factory, conversation_id: str, request_hash: str,
+    ) -> tuple[ChatStream, bool]:
+        """发送消息：返回 (ChatStream, 是否接入了进行中的生成)
+
+        断线后客户端重发同一条消息时，上一次生成可能仍在进行：接入它而不是再发起一次上游生成；
+        同一会话上发来的是另一条消息时，取消进行中的生成，以新消息重新开始，避免新消息被丢弃。
+        """
+        stream = cls.in_flight(account_id, conversation_id)
+        if stream is not None:
+            if stream.request_hash == request_hash:
+                return stream, True
+            logger.info(f'[CoreChatStream] conversation {conversation_id} got a new message, cancelling {stream.id}')
+            cls.cancel(stream)
+        return cls.start(account_id, source_factory, conversation_id=conversation_id, request_hash=request_hash), False
+
+    @classmethod
+    def bind_conversation(cls, stream: ChatStream, conversation_id: str):
+        if not conversation_id or stream.conversation_id == conversation_id:
+            return
+        stream.conversation_id = conversation_id
+        if stream.id in cls._streams:
+            cls._by_conversation[conversation_id] = stream.id
+
+    @classmethod
+    def get(cls, account_id: str, stream_id: str = None, conversation_id: str = None) -> ChatStream | None:
+        if not stream_id and conversation_id:
+            stream_id = cls._by_conversation.get(conversation_id)
+        stream = cls._streams.get(stream_id) if stream_id else None
+        if stream is None or stream.account_id != account_id:
+            return None
+        return stream
+
+    @classmethod
+    async def subscribe(cls, stream: ChatStream, last_event_id: int = 0) -> AsyncIterator[bytes]:
+        """从 last_event_id 之后开始回放缓冲区中的事件，然后跟随实时事件直到生成结束
+
+        同一生成可被多个订阅者（多标签页 / 多设备）同时读取，各订阅者只持有自己的游标，
+        慢订阅者不会阻塞生成或其他订阅者。接入后新产生、尚未读取的事件超过
+        CHAT_STREAM_SUBSCRIBER_MAX_LAG 时按 CHAT_STREAM_SLOW_SUBSCRIBER_POLICY 处理：
+        drop 丢弃积压只保留最新的事件，disconnect 发送错误事件后断开（客户端可凭 Last-Event-ID 续读）。
+        """
+        cls._attach(stream)
+        cursor = min(max(last_event_id + 1, 1), stream.next_seq)
+        # 接入前已有的事件属于回放，不计入积压
+        joined_seq = stream.next_seq
+        max_lag = tagentic_config.CHAT_STREAM_SUBSCRIBER_MAX_LAG
+        try:
+            while True:
+                async with stream.condition:
+                    await stream.condition.wait_for(lambda: stream.next_seq > cursor or stream.done)
+                if cursor < stream.first_seq:
+                    # 需要的事件已被淘汰，无法无损续读，由客户端改为重新拉取消息列表
+                    logger.info(f'[CoreChatStream] stream {stream.id} evicted events {cursor}..{stream.first_seq - 1}')
+                    yield to_event(EventType.ERROR, error=ErrorInfo(Code=410, Message='stream events expired'))
+                    return
+                batch = list(islice(stream.events, cursor - stream.first_seq, None))
+                for event in batch:
+                    lag = stream.next_seq - max(cursor, joined_seq)
+                    if lag > max_lag:
+                        break
+                    cursor += 1
+                    yield event
+                else:
+                    if stream.done and cursor >= stream.next_seq:
+                        return
+                    continue
+
+                if tagentic_config.CHAT_STREAM_SLOW_SUBSCRIBER_POLICY == 'drop':
+                    skip_to = max(stream.next_seq - max_lag, stream.first_seq)
+                    logger.info(
+                        f'[CoreChatStream] slow subscriber of stream {stream.id} dropped events {cursor}..{skip_to - 1}'
+                    )
+                    cursor = skip_to
+                    continue
+                logger.info(
+                    f'[CoreChatStream] slow subscriber of stream {stream.id} disconnected at event {cursor - 1}'
+                )
+                yield to_event(EventType.ERROR, error=ErrorInfo(Code=429, Message='subscriber too slow'))
+                return
+        finally:
+            cls._detach(stream)
+
+    @classmethod
+    def in_flight(cls, account_id: str, conversation_id: str) -> ChatStream | None:
+        """会话上正在进行的生成，供其他标签页 / 设备订阅而不是重新请求上游"""
+        stream = cls.get(account_id, conversation_id=conversation_id)
+        if stream is None or stream.done:
+            return None
+        return stream
+
+    @classmethod
+    def cancel(cls, stream: ChatStream):
+        """立即取消生成（同时关闭上游 SSE），已订阅者读完缓冲区后结束"""
+        if stream.done:
+            return
+        if stream.grace_handle is not None:
+            stream.grace_handle.cancel()
+            stream.grace_handle = None
+        stream.producer.cancel()
+
+    @classmethod
+    async def _produce(cls, stream: ChatStream, source: AsyncGenerator[bytes, None]):
+        try:
+            async for frame in source:
+                cls._append(stream, frame)
+                async with stream.condition:
+                    stream.condition.notify_all()
+        except asyncio.CancelledError:
+            logger.info(f'[CoreChatStream] stream {stream.id} cancelled')
+        except Exception as e:  # pylint: disable=broad-except
+            logger.exception(f'[CoreChatStream] stream {stream.id} failed: {e}')
+            cls._append(stream, to_event(EventType.ERROR, error=ErrorInfo(Code=500, Message='chat stream failed')))
+        finally:
+            cls._finish(stream)
+            await cls._notify(stream)
+
+    @classmethod
+    def _on_producer_done(cls, stream: ChatStream):
+        # 生成任务在首次运行前就被取消时 _produce 不会执行，在这里补做收尾
+        if cls._finish(stream):
+            task = asyncio.ensure_future(cls._notify(stream))
+            cls._tasks.add(task)
+            task.add_done_callback(cls._tasks.discard)
+
+    @classmethod
+    def _finish(cls, stream: ChatStream) -> bool:
+        """标记生成结束并安排移除；已结束时返回 False"""
+        if stream.done:
+            return False
+        stream.done = True
+        if stream.grace_handle is not None:
+            stream.grace_handle.cancel()
+        grace = tagentic_config.CHAT_STREAM_GRACE_PERIOD
+        asyncio.get_running_loop().call_later(grace, cls._remove, stream)
+        return True
+
+    @staticmethod
+    async def _notify(stream: ChatStream):
+        async with stream.condition:
+            stream.condition.notify_all()
+
+    @classmethod
+    def _append(cls, stream: ChatStream, frame: bytes):
+        event = b'id: %d\n' % stream.next_seq + frame
+        stream.next_seq += 1
+        stream.events.append(event)
+        stream.size += len(event)
+        cls._total_size += len(event)
+        while stream.size > tagentic_config.CHAT_STREAM_BUFFER_BYTES and len(stream.events) > 1:
+            cls._evict_head(stream)
+        if cls._total_size > tagentic_config.CHAT_STREAM_TOTAL_BUFFER_BYTES:
+            cls._evict_global()
+
+    @classmethod
+    def _evict_head(cls, stream: ChatStream):
+        event = stream.events.popleft()
+        stream.first_seq += 1
+        stream.size -= len(event)
+        cls._total_size -= len(event)
+
+    @classmethod
+    def _evict_global(cls):
+        limit = tagentic_config.CHAT_STREAM_TOTAL_BUFFER_BYTES
+        for stream in [s for s in cls._streams.values() if s.done]:
+            if cls._total_size <= limit:
+                return
+            cls._remove(stream)
+        for stream in list(cls._streams.values()):
+            while cls._total_size > limit and len(stream.events) > 1:
+                cls._evict_head(stream)
+            if cls._total_size <= limit:
+                return
+
+    @classmethod
+    def _remove(cls, stream: ChatStream):
+        if cls._streams.pop(stream.id, None) is None:
+            return
+        if stream.conversation_id and cls._by_conversation.get(stream.conversation_id) == stream.id:
+            del cls._by_conversation[stream.conversation_id]
+        cls._total_size -= stream.size
+        if stream.subscribers == 0:
+            stream.events.clear()
+            stream.first_seq = stream.next_seq
+            stream.size = 0
+
+    @classmethod
+    def _attach(cls, stream: ChatStream):
+        stream.subscribers += 1
+        if stream.grace_handle is not None:
+            stream.grace_handle.cancel()
+            stream.grace_handle = None
+
+    @classmethod
+    def _detach(cls, stream: ChatStream):
+        stream.subscribers -= 1
+        if stream.subscribers == 0 and not stream.done:
+            cls._schedule_grace(stream)
+
+    @classmethod
+    def _schedule_grace(cls, stream: ChatStream):
+        grace = tagentic_config.CHAT_STREAM_GRACE_PERIOD
+        if grace <= 0:
+            stream.producer.cancel()
+            return
+        stream.grace_handle = asyncio.get_running_loop().call_later(grace, stream.producer.cancel)
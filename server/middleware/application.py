@@ -1,11 +1,20 @@
-import time
 import logging
 import asyncio
+from config import tagentic_config
+from util.cache import SingleFlight, TieredCache
+from vendor.interface import ApplicationInfo
 from app_factory import TAgenticApp
 app = TAgenticApp.get_app()
 
 
 class CoreApplication:
+    """应用信息的后台刷新
+
+    - 每 APP_INFO_REFRESH_INTERVAL 秒在后台刷新一次，请求只读取内存中的结果
+    - 各应用并发拉取（最多 APP_INFO_REFRESH_CONCURRENCY 个），同一时间只有一轮刷新
+    - 单个应用拉取失败时沿用上一次的信息
+    - 启用 Redis 时结果在 worker 间共享，每个周期只有一个 worker 回源
+    """
     _instance = None
 
     # 单例模式
@@ -15,33 +24,76 @@ class CoreApplication:
         return cls._instance
 
     apps_info = []
-    apps_info_ts = time.time()
+    # 各应用最近一次成功获取的信息
+    _infos: dict[str, ApplicationInfo] = {}
+    _flight = SingleFlight()
+    _refresher: asyncio.Task | None = None
+    _cache = TieredCache('app_info', maxsize=1024, ttl=tagentic_config.APP_INFO_REFRESH_INTERVAL)
 
     async def hook_application_info(self, request):
-        ts = time.time()
-        if ts - self.apps_info_ts > 60:
-            self.apps_info_ts = ts
-            # 异步更新，不阻塞流程
-            task = asyncio.create_task(self.update_application_info())
-            logging.info(f'[update_application_info] {task}')
-
         request.ctx.apps_info = self.apps_info
 
     async def update_application_info(self):
+        # 已有进行中的刷新时等待它完成，不再发起新一轮
+        await self._flight.do('refresh', self._refresh)
+
+    async def _refresh(self):
         logging.info('[update_application_info] begin')
+        semaphore = asyncio.Semaphore(tagentic_config.APP_INFO_REFRESH_CONCURRENCY)
 
-        apps = app.apps
-        _apps_info = []
-        for application_id, vendor_app in apps.items():
-            info = await vendor_app.get_info()
-            info.ApplicationId = application_id
-            _apps_info.append(info)
-            # print(vendor_app)
-            # print(info)
+        async def fetch(application_id, vendor_app):
+            async with semaphore:
+                return await self._fetch_info(application_id, vendor_app)
 
-        self.apps_info = _apps_info
+        CoreApplication.apps_info = list(await asyncio.gather(
+            *(fetch(application_id, vendor_app) for application_id, vendor_app in app.apps.items())
+        ))
         logging.info('[update_application_info] done')
 
+    async def _fetch_info(self, application_id: str, vendor_app) -> ApplicationInfo:
+        previous = self._infos.get(application_id)
+        cached = await self._cache.get(application_id)
+        lock_ttl = tagentic_config.APP_INFO_REFRESH_INTERVAL / 2
+        if cached is not None:
+            info = ApplicationInfo(**cached)
+        elif previous is not None and not await self._cache.lock(application_id, lock_ttl):
+            # 其他 worker 正在回源，本轮沿用旧数据，下一轮从 Redis 读取
+            return previous
+        else:
+            try:
+                info = await vendor_app.get_info()
+            except Exception as e:  # pylint: disable=broad-except
+                logging.warning(f'[update_application_info] failed to get info of {application_id}: {e}')
+                if previous is not None:
+                    return previous
+                return ApplicationInfo(
+                    ApplicationId=application_id,
+                    Name='Unknown',
+                    Greeting='Please check your AppKey/SseURL/TC_SECRET_ID/TC_SECRET_KEY',
+                )
+            info.ApplicationId = application_id
+            await self._cache.set(application_id, info.model_dump())
+        self._infos[application_id] = info
+        return info
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(tagentic_config.APP_INFO_REFRESH_INTERVAL)
+            try:
+                await self.update_application_info()
+            except Exception as e:  # pylint: disable=broad-except
+                logging.warning(f'[update_application_info] unexpected error: {e}')
+
+    def start(self):
+        if CoreApplication._refresher is None or CoreApplication._refresher.done():
+            CoreApplication._refresher = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if CoreApplication._refresher is not None:
+            CoreApplication._refresher.cancel()
+            await asyncio.gather(CoreApplication._refresher, return_exceptions=True)
+            CoreApplication._refresher = None
+
 
 @app.listener('before_server_start')
 async def init_application_info(app, loop):
@@ -49,6 +101,16 @@ async def init_application_info(app, loop):
     await core_app.update_application_info()
 
 
+@app.listener('after_server_start')
+async def start_application_info_refresher(app, loop):
+    CoreApplication().start()
+
+
+@app.listener('before_server_stop')
+async def stop_application_info_refresher(app, loop):
+    await CoreApplication().stop()
+
+
 @app.middleware("request")
 async def application_info(request):
     await CoreApplication().hook_application_info(request)
@@ -0,0 +1,8 @@
+from util.cos import cos_executor
+from app_factory import TAgenticApp
+app = TAgenticApp.get_app()
+
+
+@app.listener('before_server_stop')
+async def shutdown_cos_executor(app, loop):
+    cos_executor.shutdown()
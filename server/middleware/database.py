@@ -2,6 +2,7 @@ import logging
 from contextvars import ContextVar
 
 from core.migration import Migration
+from core.conversation import ConversationWriteBehind
 from util.database import create_db_engine
 from app_factory import TAgenticApp
 app = TAgenticApp.get_app()
@@ -9,7 +10,7 @@ app = TAgenticApp.get_app()
 _base_model_db_ctx = ContextVar("db")
 
 # SSE/Streaming 路由不需要中间件 session，这些路由内部通过 db_connection() 自行管理
-_SKIP_SESSION_PATHS = frozenset({'/chat/message', '/file/parse'})
+_SKIP_SESSION_PATHS = frozenset({'/chat/message', '/chat/message/resume', '/chat/message/stop', '/file/parse'})
 
 
 async def _cleanup_session(request):
@@ -78,6 +79,16 @@ async def connect_db(app, loop):
         await db.close()
 
 
+@app.listener('after_server_start')
+async def start_conversation_write_behind(app, loop):
+    ConversationWriteBehind.start()
+
+
 @app.listener('before_server_stop')
 async def disconnect_db(app, loop):
+    # 先写入尚未落库的会话更新，再释放连接池
+    try:
+        await ConversationWriteBehind.stop()
+    except Exception as e:
+        logging.warning('[disconnect_db] conversation write-behind flush failed: %s', e)
     await app.config['db'].dispose()
@@ -0,0 +1,15 @@
+from util.http import http_pool, sse_pool
+from app_factory import TAgenticApp
+app = TAgenticApp.get_app()
+
+
+@app.listener('before_server_start')
+async def open_http_pool(app, loop):
+    http_pool.open()
+    sse_pool.open()
+
+
+@app.listener('after_server_stop')
+async def close_http_pool(app, loop):
+    await http_pool.close()
+    await sse_pool.close()
@@ -1,9 +1,12 @@
 import logging
+import time
 
 import limits
+from limits.errors import StorageError
 from sanic.request.types import Request
 
 from util.helper import get_remote_ip
+from util.redis import get_redis
 from core.error.server import RateLimit
 from app_factory import TAgenticApp
 from router import check_login
@@ -11,9 +14,54 @@ from router import check_login
 
 logger = logging.getLogger(__name__)
 app = TAgenticApp.get_app()
-limits_storage = limits.aio.storage.MemoryStorage()
-moving_window = limits.aio.strategies.MovingWindowRateLimiter(limits_storage)
-limit_rule = limits.parse(app.config.RATE_LIMIT)
+
+# Redis 不可达时退回进程内的 MemoryStorage，并在一段时间后再重试 Redis
+_REDIS_RETRY_INTERVAL = 30
+
+memory_window = limits.aio.strategies.MovingWindowRateLimiter(limits.aio.storage.MemoryStorage())
+redis_window = None
+_redis_retry_at = 0.0
+
+redis_client = get_redis()
+if redis_client is not None:
+    # moving window 在 Redis 上通过 Lua 脚本原子地完成检查与计数，多 worker / 多 pod 共享同一限额
+    redis_storage = limits.aio.storage.RedisStorage(
+        f"async+redis://{app.config.REDIS_HOST}:{app.config.REDIS_PORT}/{app.config.REDIS_DB}",
+        connection_pool=redis_client.connection_pool,
+        implementation="redispy",
+        wrap_exceptions=True,
+    )
+    redis_window = limits.aio.strategies.MovingWindowRateLimiter(redis_storage)
+
+default_rule = limits.parse(app.config.RATE_LIMIT)
+# 按路径前缀长度倒序，保证最长前缀优先匹配
+route_rules = sorted(
+    ((prefix, limits.parse(rule)) for prefix, rule in app.config.RATE_LIMIT_RULES.items()),
+    key=lambda item: len(item[0]),
+    reverse=True,
+)
+
+
+def match_rule(path: str) -> limits.RateLimitItem:
+    # 按路径段匹配：/chat/message 匹配 /chat/message 与 /chat/message/...，但不匹配 /chat/messages
+    for prefix, rule in route_rules:
+        prefix = prefix.rstrip('/')
+        if path == prefix or path.startswith(prefix + '/'):
+            return rule
+    return default_rule
+
+
+async def hit(rule: limits.RateLimitItem, key: str) -> bool:
+    global _redis_retry_at
+    if redis_window is not None and time.monotonic() >= _redis_retry_at:
+        try:
+            return await redis_window.hit(rule, key)
+        except StorageError as e:
+            _redis_retry_at = time.monotonic() + _REDIS_RETRY_INTERVAL
+            logger.warning(
+                f"[limiter] redis unavailable, falling back to memory storage for {_REDIS_RETRY_INTERVAL}s: {e}"
+            )
+    return await memory_window.hit(rule, key)
 
 
 @app.middleware("request")
@@ -31,7 +79,7 @@ async def limit_handler(request: Request):
         pass
 
     id = account_id or ip
-    too_many_req = not await moving_window.hit(limit_rule, f"{request.server_path},{id}")
+    too_many_req = not await hit(match_rule(request.server_path), f"{request.server_path},{id}")
     if too_many_req:
         logger.warning(f"[limiter] too many requests to: {request.server_path} ip: {ip} account_id: {account_id}")
         raise RateLimit("Too many requests")
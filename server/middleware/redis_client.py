@@ -0,0 +1,8 @@
+from util.redis import close_redis
+from app_factory import TAgenticApp
+app = TAgenticApp.get_app()
+
+
+@app.listener('after_server_stop')
+async def close_redis_client(app, loop):
+    await close_redis()
@@ -1,4 +1,6 @@
-from sqlalchemy import func, Column, String, Text, JSON, DateTime, text
+from sqlalchemy import func, Column, String, Text, JSON, DateTime, Index, text
+from sqlalchemy import BigInteger, Boolean, Identity, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy import UUID
 from model.base import Base
@@ -25,6 +27,22 @@ class ChatConversation(Base):
     CreatedAt = Column(DateTime, nullable=False, server_default=func.current_timestamp())
 
 
+# 侧栏会话列表按 LastActiveAt 倒序做 keyset 分页（见 CoreConversation.list_page）
+Index(
+    'ix_chat_conversation_account_app_active',
+    ChatConversation.AccountId,
+    ChatConversation.ApplicationId,
+    ChatConversation.LastActiveAt.desc(),
+    ChatConversation.Id,
+)
+Index(
+    'ix_chat_conversation_account_active',
+    ChatConversation.AccountId,
+    ChatConversation.LastActiveAt.desc(),
+    ChatConversation.Id,
+)
+
+
 class SharedConversation(Base):
     __tablename__ = "shared_conversation"
 
@@ -34,3 +52,40 @@ class SharedConversation(Base):
     ParentConversationId = Column(UUID(), nullable=False)
     CreatedAt = Column(DateTime, nullable=False, server_default=func.current_timestamp())
     Records = Column(JSON(64), nullable=False)
+    # 分享时预取的引用详情 {ReferBizId: detail}，分享页查看引用时不再回源
+    References = Column(JSON, nullable=True)
+
+
+class ChatHistoryRecord(Base):
+    """经本服务 SSE 中转（或从上游回填）的完整 V2 Record，见 core/history.py"""
+    __tablename__ = "chat_history_record"
+    __table_args__ = (
+        UniqueConstraint('ConversationId', 'RecordId', name='uq_chat_history_record_conversation_record'),
+    )
+
+    # 会话内按 Seq 升序即消息的先后顺序
+    Seq: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    ConversationId = Column(UUID(), nullable=False)
+    RecordId = Column(String(128), nullable=False)
+    Record = Column(JSONB, nullable=False)
+    CreatedAt = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+
+
+Index(
+    'ix_chat_history_record_conversation_seq',
+    ChatHistoryRecord.ConversationId,
+    ChatHistoryRecord.Seq,
+)
+
+
+class ChatHistoryState(Base):
+    """会话本地历史是否完整；Complete=False 时 /chat/messages 回源上游"""
+    __tablename__ = "chat_history_state"
+
+    ConversationId: Mapped[str] = mapped_column(UUID(), primary_key=True)
+    Complete = Column(Boolean, nullable=False, default=False)
+    # relay：会话从第一轮起即经本服务中转；否则为回填时使用的上游接口名
+    Source = Column(String(64), nullable=False)
+    # 进行中的回填标记，回填期间有新一轮对话时置空，回填结果随之作废
+    BackfillToken = Column(UUID(), nullable=True)
+    UpdatedAt = Column(DateTime, nullable=False, server_default=func.current_timestamp())
@@ -0,0 +1,18 @@
+from sqlalchemy import func, Column, String, Text, DateTime, BigInteger
+
+from model.base import Base
+
+
+class FileUploadIndex(Base):
+    """按内容哈希索引已上传到 COS 的文件，重复上传直接复用，见 core/file.py"""
+    __tablename__ = "file_upload_index"
+
+    # 应用级去重为 ApplicationId，账户级去重为 ApplicationId/AccountId
+    Scope = Column(String(128), primary_key=True)
+    Sha256 = Column(String(64), primary_key=True)
+    Url = Column(Text(), nullable=False)
+    CosUrl = Column(Text(), nullable=False)
+    CosBucket = Column(String(255), nullable=False)
+    Size = Column(BigInteger, nullable=False)
+    CreatedAt = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+    ExpiresAt = Column(DateTime, nullable=False, index=True)
@@ -6,7 +6,7 @@ from sanic.request.types import Request
 
 from util.helper import get_remote_ip, get_path_base
 from util.auth_cookie import add_auth_token_cookie
-from core.error.account import AccountUnauthorized
+from core.error.account import AccountUnauthorized, AccountForbidden
 from core.session import SessionToken
 from core.account import CoreAccount
 
@@ -14,17 +14,28 @@ from core.account import CoreAccount
 def setup_account_info(request, token):
     token = SessionToken.check(token)
     request.ctx.account_id = token['AccountId']
+    request.ctx.login_error = None
 
 
 def check_login(request):
-    auth = request.headers.get("Authorization")
-    if auth is None:
-        auth = request.cookies.get('token', None)
-    if auth is None:
-        raise AccountUnauthorized()
+    # 限流中间件与 login_required 等都会调用，同一请求内只校验一次
+    if hasattr(request.ctx, 'login_error'):
+        if request.ctx.login_error is not None:
+            raise request.ctx.login_error
+        return
 
-    auth_token = auth.split(' ')[-1]
-    setup_account_info(request, auth_token)
+    try:
+        auth = request.headers.get("Authorization")
+        if auth is None:
+            auth = request.cookies.get('token', None)
+        if auth is None:
+            raise AccountUnauthorized()
+
+        auth_token = auth.split(' ')[-1]
+        setup_account_info(request, auth_token)
+    except AccountUnauthorized as e:
+        request.ctx.login_error = e
+        raise
 
 
 def login_required(view):
@@ -39,6 +50,22 @@ def login_required(view):
     return decorated
 
 
+def admin_required(view):
+    """仅允许管理员账号访问，如内部运行指标等接口"""
+    @wraps(view)
+    async def decorated(*args, **kwargs):
+        _, request = args
+
+        check_login(request)
+        account = await CoreAccount.get(request.ctx.db, request.ctx.account_id)
+        if account is None or not account.is_admin:
+            raise AccountForbidden('Admin role is required')
+
+        return await view(*args, **kwargs)
+
+    return decorated
+
+
 async def auto_login(request: Request):
     need_register = False
     try:
@@ -12,6 +12,7 @@ from router import login_required, check_login
 from core.chat import CoreChat
 from core.conversation import CoreConversation
 from core.share import CoreShareConversation
+from core.stream import CoreStream, CoreChatStream
 from app_factory import TAgenticApp
 app: TAgenticApp = TAgenticApp.get_app()
 
@@ -39,7 +40,7 @@ class ChatMessageApi(HTTPMethodView):
             IsChannel: {args['IsChannel']},\n\
             vendor_app: {vendor_app}")
 
-        async def streaming_fn(response):
+        def chat_source(stream):
             chat_gen = CoreChat.message(
                 vendor_app,
                 request.ctx.account_id,
@@ -48,15 +49,96 @@ class ChatMessageApi(HTTPMethodView):
                 args['SearchNetwork'],
                 args['CustomVariables'],
                 is_channel=args['IsChannel'],
+                on_conversation=lambda conversation_id: CoreChatStream.bind_conversation(stream, conversation_id),
+            )
+            window_ms, max_bytes = CoreStream.coalesce_options(vendor_app)
+            if window_ms > 0:
+                chat_gen = CoreStream.coalesce(chat_gen, window_ms, max_bytes)
+            return chat_gen
+
+        # 生成在后台进行，客户端断开后仍可在宽限期内通过 /chat/message/resume 续读
+        request_hash = CoreChatStream.request_hash(
+            args['Contents'], args['SearchNetwork'], args['CustomVariables'], args['IsChannel'],
+        )
+        stream, attached = CoreChatStream.attach_or_start(
+            request.ctx.account_id, chat_source, args['ConversationId'], request_hash,
+        )
+        last_event_id = 0
+        if attached:
+            logging.info(
+                f"[ChatMessageApi] conversation {args['ConversationId']} has stream {stream.id} in flight, attaching"
             )
             try:
-                async for data in chat_gen:
+                last_event_id = int(request.headers.get('Last-Event-ID') or 0)
+            except ValueError:
+                last_event_id = 0
+
+        async def streaming_fn(response):
+            try:
+                async for data in CoreChatStream.subscribe(stream, last_event_id):
                     await response.write(data)
             except asyncio.CancelledError:
-                logging.info("[ChatMessageApi] Client disconnected, closing upstream")
-                await chat_gen.aclose()
+                logging.info(f"[ChatMessageApi] Client disconnected, stream {stream.id} detached")
                 raise
-        return ResponseStream(streaming_fn, content_type='text/event-stream; charset=utf-8')
+        return ResponseStream(
+            streaming_fn,
+            headers={'X-Stream-Id': stream.id},
+            content_type='text/event-stream; charset=utf-8',
+        )
+
+
+class ChatMessageResumeApi(HTTPMethodView):
+    @login_required
+    async def get(self, request: Request):
+        parser = reqparse.RequestParser()
+        parser.add_argument("StreamId", type=str, location="args")
+        parser.add_argument("ConversationId", type=str, location="args")
+        parser.add_argument("LastEventId", type=int, location="args")
+        args = parser.parse_args(request)
+
+        last_event_id = args['LastEventId']
+        if last_event_id is None:
+            try:
+                last_event_id = int(request.headers.get('Last-Event-ID') or 0)
+            except ValueError as e:
+                raise SanicException('invalid Last-Event-ID', status_code=400) from e
+
+        stream = CoreChatStream.get(
+            request.ctx.account_id,
+            stream_id=args['StreamId'],
+            conversation_id=args['ConversationId'],
+        )
+        if stream is None:
+            raise SanicException("stream not found", status_code=404)
+
+        async def streaming_fn(response):
+            async for data in CoreChatStream.subscribe(stream, last_event_id):
+                await response.write(data)
+        return ResponseStream(
+            streaming_fn,
+            headers={'X-Stream-Id': stream.id},
+            content_type='text/event-stream; charset=utf-8',
+        )
+
+
+class ChatMessageStopApi(HTTPMethodView):
+    @login_required
+    async def post(self, request: Request):
+        """停止生成：立即取消上游生成，而不是等待断线宽限期结束"""
+        parser = reqparse.RequestParser()
+        parser.add_argument("StreamId", type=str, location="json")
+        parser.add_argument("ConversationId", type=str, location="json")
+        args = parser.parse_args(request)
+
+        stream = CoreChatStream.get(
+            request.ctx.account_id,
+            stream_id=args['StreamId'],
+            conversation_id=args['ConversationId'],
+        )
+        if stream is not None:
+            logging.info(f"[ChatMessageStopApi] stopping stream {stream.id}")
+            CoreChatStream.cancel(stream)
+        return sanic.json({"Success": 1})
 
 
 class ChatMessageListApi(HTTPMethodView):
@@ -104,7 +186,7 @@ class ChatMessageListApi(HTTPMethodView):
                         app_info = await vendor_app.get_info()
                         if getattr(app_info, 'Pattern', None) == 'ClawAgent':
                             is_claw = True
-                    except (OSError, ValueError, KeyError, AttributeError) as e:
+                    except (OSError, ValueError, KeyError, AttributeError, RuntimeError) as e:
                         logging.warning(
                             f'[ChatApi] get_info failed for {application_id}: {e}'
                         )
@@ -141,6 +223,11 @@ class ChatMessageListApi(HTTPMethodView):
                         'Records': records,
                     }
                 }
+            # 会话上有正在进行的生成（如另一标签页发起）：返回 StreamId，
+            # 前端通过 /chat/message/resume 订阅同一条生成，而不是重新请求上游
+            stream = CoreChatStream.in_flight(request.ctx.account_id, args['ConversationId'])
+            if stream is not None:
+                resp['Response']['StreamId'] = stream.id
             return sanic.json(resp)
 
         if args["ShareId"] is not None:
@@ -160,14 +247,31 @@ class ChatConversationListApi(HTTPMethodView):
     async def get(self, request: Request):
         parser = reqparse.RequestParser()
         parser.add_argument("ApplicationId", type=str, required=False, location="args")
+        parser.add_argument("Limit", type=int, required=False, location="args")
+        parser.add_argument("Cursor", type=str, required=False, location="args")
         args = parser.parse_args(request)
 
-        conversations = await CoreConversation.list(
+        if args["Limit"] is None and args["Cursor"] is None and app.config.CHAT_CONVERSATION_LIST_UNPAGINATED:
+            conversations = await CoreConversation.list(
+                request.ctx.db,
+                request.ctx.account_id,
+                application_id=args["ApplicationId"],
+            )
+            return sanic.json([conversation.to_dict() for conversation in conversations])
+
+        page_size = app.config.CHAT_CONVERSATION_PAGE_SIZE
+        limit = min(max(args["Limit"] or page_size, 1), page_size)
+        conversations, next_cursor = await CoreConversation.list_page(
             request.ctx.db,
             request.ctx.account_id,
             application_id=args["ApplicationId"],
+            limit=limit,
+            cursor=args["Cursor"],
         )
-        return sanic.json([conversation.to_dict() for conversation in conversations])
+        return sanic.json({
+            "Conversations": [conversation.to_dict() for conversation in conversations],
+            "NextCursor": next_cursor,
+        })
 
 
 class ChatConversationDeleteApi(HTTPMethodView):
@@ -182,6 +286,8 @@ class ChatConversationDeleteApi(HTTPMethodView):
 
 
 app.add_route(ChatMessageApi.as_view(), "/chat/message")
+app.add_route(ChatMessageResumeApi.as_view(), "/chat/message/resume")
+app.add_route(ChatMessageStopApi.as_view(), "/chat/message/stop")
 app.add_route(ChatMessageListApi.as_view(), "/chat/messages")
 app.add_route(ChatConversationListApi.as_view(), "/chat/conversations")
 app.add_route(ChatConversationDeleteApi.as_view(), "/chat/conversation/delete")
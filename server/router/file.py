@@ -3,11 +3,25 @@ from sanic.views import stream
 from sanic.views import HTTPMethodView
 from sanic_restful_api import reqparse
 from sanic.request.types import Request
+from sanic.exceptions import SanicException
 from router import login_required
+from core.file import CoreFileIndex
 from app_factory import TAgenticApp
 app: TAgenticApp = TAgenticApp.get_app()
 
 
+async def record_upload(request: Request, application_id: str, result: dict, trusted: bool = False):
+    """把带内容哈希的上传结果写入去重索引；trusted 表示哈希由服务端根据实际内容计算"""
+    sha256 = CoreFileIndex.normalize_hash(result.get('Sha256'))
+    if sha256 is None:
+        return
+    await CoreFileIndex.record(
+        request.ctx.db, application_id, request.ctx.account_id, sha256, result.get('Size', 0), result,
+        trusted=trusted,
+    )
+    await request.ctx.db.commit()
+
+
 class FileUploadApi(HTTPMethodView):
     @stream
     @login_required
@@ -16,10 +30,19 @@ class FileUploadApi(HTTPMethodView):
         parser.add_argument("ApplicationId", type=str, required=True, location="args")
         parser.add_argument("Type", type=str, default='image/jpeg', location="args")
         parser.add_argument("Mode", type=str, default='standard', location="args")
+        parser.add_argument("Sha256", type=str, required=False, location="args")
         args = parser.parse_args(request)
         application_id = args['ApplicationId']
         vendor_app = app.get_vendor_app(application_id)
 
+        # 客户端先给出内容哈希时，命中本账户的去重记录即不再读取请求体（声明的哈希未经校验，不查其他账户）
+        dedupe = CoreFileIndex.enabled(args['Mode'])
+        sha256 = CoreFileIndex.normalize_hash(args['Sha256'])
+        if dedupe and sha256:
+            hit = await CoreFileIndex.lookup(request.ctx.db, application_id, request.ctx.account_id, sha256)
+            if hit is not None:
+                return json(hit)
+
         result = await vendor_app.upload(
             request.ctx.db,
             request,
@@ -29,8 +52,76 @@ class FileUploadApi(HTTPMethodView):
         )
         # 兼容返回字典或字符串两种格式
         if isinstance(result, dict):
+            # 请求体已经上传，直接返回本次上传的对象；服务端边上传边计算的哈希可信，
+            # 按 FILE_DEDUPE_SCOPE 记录（已有相同内容的记录时改为指向本次上传）
+            if dedupe:
+                await record_upload(request, application_id, result, trusted=True)
             return json(result)
         return json({"Url": result})
 
 
+class FileUploadIntentApi(HTTPMethodView):
+    @login_required
+    async def post(self, request: Request):
+        """申请浏览器直传 COS，文件内容不经过本服务"""
+        parser = reqparse.RequestParser()
+        parser.add_argument("ApplicationId", type=str, required=True, location="json")
+        parser.add_argument("Type", type=str, default='image/jpeg', location="json")
+        parser.add_argument("Mode", type=str, default='standard', location="json")
+        parser.add_argument("Size", type=int, required=True, location="json")
+        parser.add_argument("Sha256", type=str, required=False, location="json")
+        args = parser.parse_args(request)
+        if args['Size'] < 0:
+            raise SanicException("Size must not be negative", status_code=400)
+        vendor_app = app.get_vendor_app(args['ApplicationId'])
+
+        sha256 = CoreFileIndex.normalize_hash(args['Sha256']) if CoreFileIndex.enabled(args['Mode']) else None
+        if sha256:
+            hit = await CoreFileIndex.lookup(request.ctx.db, args['ApplicationId'], request.ctx.account_id, sha256)
+            # 命中时直接返回结果，无需上传也无需 complete
+            if hit is not None and hit.get('Size', args['Size']) == args['Size']:
+                return json(hit)
+
+        try:
+            result = await vendor_app.upload_intent(
+                request.ctx.db,
+                request.ctx.account_id,
+                args['Type'],
+                args['Size'],
+                mode=args['Mode'],
+                sha256=sha256,
+            )
+        except NotImplementedError as error:
+            raise SanicException(str(error), status_code=501) from error
+        return json(result)
+
+
+class FileUploadCompleteApi(HTTPMethodView):
+    @login_required
+    async def post(self, request: Request):
+        """直传完成后校验对象，返回与 /file/upload 相同的结果"""
+        parser = reqparse.RequestParser()
+        parser.add_argument("ApplicationId", type=str, required=True, location="json")
+        parser.add_argument("Token", type=str, required=True, location="json")
+        parser.add_argument("Parts", type=list[dict], required=False, location="json")
+        args = parser.parse_args(request)
+        vendor_app = app.get_vendor_app(args['ApplicationId'])
+
+        try:
+            result = await vendor_app.upload_complete(
+                request.ctx.db,
+                request.ctx.account_id,
+                args['Token'],
+                parts=args['Parts'],
+            )
+        except NotImplementedError as error:
+            raise SanicException(str(error), status_code=501) from error
+        # 直传时的哈希由客户端声明、未经服务端校验，只记录在本账户范围内，不会被其他账户命中
+        if CoreFileIndex.enabled():
+            await record_upload(request, args['ApplicationId'], result)
+        return json(result)
+
+
 app.add_route(FileUploadApi.as_view(), "/file/upload")
+app.add_route(FileUploadIntentApi.as_view(), "/file/upload/intent")
+app.add_route(FileUploadCompleteApi.as_view(), "/file/upload/complete")
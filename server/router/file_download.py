@@ -2,21 +2,41 @@
 
 通过后端代理从工作空间下载文件，避免前端直接访问 COS 产生跨域问题。
 前端直接使用同域的 /file/download?... URL 即可下载或预览文件。
+
+文件边读边转发，不在内存中缓存；支持 Range / If-Range（206），浏览器和播放器可拖动进度、断点续传。
 """
+import asyncio
 import logging
+from contextlib import AsyncExitStack
 from urllib.parse import quote
 
 from sanic.views import HTTPMethodView
 from sanic_restful_api import reqparse
 from sanic.request.types import Request
-from sanic.response import raw
+from sanic.response import ResponseStream, empty
 from sanic.exceptions import SanicException
 
+from config import tagentic_config
 from router import login_required
+from util.download import RangeNotSatisfiable, parse_range, if_range_matches, slice_chunks
 from app_factory import TAgenticApp
 
 app: TAgenticApp = TAgenticApp.get_app()
 
+# 每个账户进行中的下载数（worker 内）
+_active_downloads: dict[str, int] = {}
+
+# 原样转发给客户端的上游响应头
+_FORWARD_HEADERS = ('Content-Length', 'Content-Range', 'ETag', 'Last-Modified')
+
+_CHUNK_SIZE = 64 * 1024
+
+# 处理函数返回后响应应立即开始写出；超过该时间（秒）仍未开始（如客户端已断开、请求被取消）时
+# 视为不会再发送，关闭上游响应并释放下载名额，避免名额泄漏导致该账户一直 429
+_STREAM_START_TIMEOUT = 10
+
+_abandoned: set[asyncio.Task] = set()
+
 
 class FileDownloadApi(HTTPMethodView):
     """文件代理下载
@@ -52,39 +72,118 @@ class FileDownloadApi(HTTPMethodView):
 
         vendor_app = app.get_vendor_app(application_id)
 
-        if not hasattr(vendor_app, 'download_file_content'):
+        if not hasattr(vendor_app, 'open_file_content'):
             raise SanicException(
                 'This vendor does not support file download',
                 status_code=501
             )
 
-        try:
-            content, content_type, file_name = await vendor_app.download_file_content(
-                app_id=app_id,
-                workspace_id=workspace_id,
-                path=file_path,
-            )
-        except Exception as e:
-            logging.error(f'[FileDownloadApi] download failed: {e}')
-            raise SanicException(
-                f'文件下载失败: {str(e)}',
-                status_code=502
-            ) from e
+        account_id = request.ctx.account_id
+        if _active_downloads.get(account_id, 0) >= tagentic_config.FILE_DOWNLOAD_MAX_CONCURRENCY:
+            raise SanicException('Too many concurrent downloads', status_code=429)
+        _active_downloads[account_id] = _active_downloads.get(account_id, 0) + 1
 
-        # 使用 RFC 5987 编码文件名以支持中文等非 ASCII 字符
-        encoded_filename = quote(file_name, safe='')
-
-        return raw(
-            body=content,
-            content_type=content_type,
-            headers={
+        # 上游连接在响应写完（或客户端断开）后才关闭
+        stack = AsyncExitStack()
+        stack.callback(_release, account_id)
+        try:
+            range_headers = {
+                name: request.headers[name] for name in ('Range', 'If-Range') if name in request.headers
+            }
+            try:
+                upstream = await stack.enter_async_context(vendor_app.open_file_content(
+                    app_id=app_id,
+                    workspace_id=workspace_id,
+                    path=file_path,
+                    headers=range_headers,
+                ))
+            except Exception as e:
+                logging.error(f'[FileDownloadApi] download failed: {e}')
+                raise SanicException(
+                    f'文件下载失败: {str(e)}',
+                    status_code=502
+                ) from e
+
+            # 使用 RFC 5987 编码文件名以支持中文等非 ASCII 字符
+            file_name = file_path.rsplit('/', 1)[-1]
+            encoded_filename = quote(file_name, safe='')
+            headers = {
                 'Content-Disposition': (
                     f"attachment; filename=\"{encoded_filename}\"; "
                     f"filename*=UTF-8''{encoded_filename}"
                 ),
                 'Cache-Control': 'no-cache',
-            },
-        )
+            }
+            for name in _FORWARD_HEADERS:
+                if name in upstream.headers:
+                    headers[name] = upstream.headers[name]
+            content_type = upstream.headers.get('Content-Type', 'application/octet-stream')
+            status = upstream.status
+            chunks = upstream.content.iter_chunked(_CHUNK_SIZE)
+
+            size = upstream.content_length
+            if status == 206:
+                headers['Accept-Ranges'] = 'bytes'
+            elif status == 200 and size is not None:
+                headers['Accept-Ranges'] = 'bytes'
+                # 上游未处理 Range 时由本服务截取区间
+                if 'Range' in range_headers and if_range_matches(
+                    range_headers.get('If-Range'), upstream.headers.get('ETag'), upstream.headers.get('Last-Modified'),
+                ):
+                    try:
+                        byte_range = parse_range(range_headers['Range'], size)
+                    except RangeNotSatisfiable:
+                        status = 416
+                        byte_range = None
+                        headers['Content-Range'] = f'bytes */{size}'
+                    if byte_range is not None:
+                        start, end = byte_range
+                        status = 206
+                        chunks = slice_chunks(chunks, start, end)
+                        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+                        headers['Content-Length'] = str(end - start + 1)
+
+            if status == 416:
+                headers.pop('Content-Length', None)
+                await stack.aclose()
+                return empty(status=416, headers=headers)
+        except BaseException:
+            await stack.aclose()
+            raise
+
+        started = False
+
+        def abandon():
+            nonlocal started
+            if started:
+                return
+            started = True
+            logging.info(f'[FileDownloadApi] response for {file_path} never started streaming, releasing')
+            task = asyncio.ensure_future(stack.aclose())
+            _abandoned.add(task)
+            task.add_done_callback(_abandoned.discard)
+
+        watchdog = asyncio.get_running_loop().call_later(_STREAM_START_TIMEOUT, abandon)
+
+        async def streaming_fn(response):
+            nonlocal started
+            watchdog.cancel()
+            if started:
+                return
+            started = True
+            async with stack:
+                async for chunk in chunks:
+                    await response.write(chunk)
+
+        return ResponseStream(streaming_fn, status=status, headers=headers, content_type=content_type)
+
+
+def _release(account_id: str):
+    count = _active_downloads.get(account_id, 0) - 1
+    if count > 0:
+        _active_downloads[account_id] = count
+    else:
+        _active_downloads.pop(account_id, None)
 
 
 app.add_route(FileDownloadApi.as_view(), "/file/download")
@@ -32,6 +32,11 @@ class ReferenceDetailApi(HTTPMethodView):
             if shared_conversation is None:
                 raise SanicException("share not found", status_code=404)
             application_id = shared_conversation.ApplicationId
+            # 分享时已预取的引用直接返回，分享页查看不回源
+            shared_references = shared_conversation.References or {}
+            wanted = [reference_id for reference_id in dict.fromkeys(reference_ids) if reference_id]
+            if all(reference_id in shared_references for reference_id in wanted):
+                return json({"References": [shared_references[reference_id] for reference_id in wanted]})
         else:
             if not application_id:
                 raise SanicException("ApplicationId or ShareId is required", status_code=400)
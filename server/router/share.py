@@ -26,28 +26,22 @@ class ShareCreateApi(HTTPMethodView):
         )
         vendor_app = app.get_vendor_app(application_id)
 
-        # 分页加载所有消息，合并
-        records = []
-        last_record_id = None
-        while True:
-            _records = await vendor_app.get_messages(
-                request.ctx.db, request.ctx.account_id, args['ConversationId'], 10, last_record_id=last_record_id
-            )
-            records = _records + records
-            if len(_records) > 0:
-                item = _records[0]
-                last_record_id = item.RecordId if hasattr(item, 'RecordId') else item.get("RecordId")
-            else:
-                break
-
-        records = [
-            record.model_dump() if hasattr(record, 'model_dump') else record
-            for record in records
-            if (record.RecordId if hasattr(record, 'RecordId') else record.get("RecordId")) in args["RecordIds"]
-        ]
+        # 已取得会话归属信息，结束只读事务；收集记录时只在读本地的片刻另行签出连接，翻页拉取上游期间不占用连接
+        await request.ctx.db.commit()
+
+        records = await CoreShareConversation.collect_records(
+            vendor_app,
+            request.ctx.account_id,
+            args['ConversationId'],
+            args['RecordIds'],
+            app.config.CHAT_MESSAGE_PAGE_SIZE,
+        )
+
+        references = await CoreShareConversation.prefetch_references(vendor_app, request.ctx.account_id, records)
 
         shared = await CoreShareConversation.create(
-            request.ctx.db, request.ctx.account_id, args["ConversationId"], args["ApplicationId"], records
+            request.ctx.db, request.ctx.account_id, args["ConversationId"], args["ApplicationId"], records,
+            references=references,
         )
 
         return json({"ShareId": shared.Id})
@@ -3,6 +3,10 @@ from sanic.views import HTTPMethodView
 from sanic.request.types import Request
 
 from app_factory import TAgenticApp
+from router import admin_required
+from core.conversation import ConversationWriteBehind
+from util.http import http_pool, sse_pool
+from util.cos import cos_executor
 
 app = TAgenticApp.get_app()
 
@@ -19,3 +23,17 @@ class SystemConfigApi(HTTPMethodView):
 
 
 app.add_route(SystemConfigApi.as_view(), "/system/config")
+
+
+class SystemPoolStatsApi(HTTPMethodView):
+    @admin_required
+    async def get(self, request: Request):
+        return json({
+            "Http": http_pool.stats(),
+            "Sse": sse_pool.stats(),
+            "ConversationWriteBehind": ConversationWriteBehind.stats(),
+            "Cos": cos_executor.stats(),
+        })
+
+
+app.add_route(SystemPoolStatsApi.as_view(), "/system/pool/stats")
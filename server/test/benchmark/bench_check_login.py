@@ -0,0 +1,63 @@
+"""
+登录校验开销基准测试
+
+模拟一个已登录请求依次经过限流中间件与 login_required（各调用一次 check_login），
+对比逐次 JWT 验签（优化前）与请求内复用 + 已验证 token 缓存（优化后）的单请求开销。
+
+用法（在 server 目录下）：
+    python -m test.benchmark.bench_check_login --requests 100000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, UTC
+from types import SimpleNamespace
+
+import jwt
+
+from config import tagentic_config
+from core.session import SessionToken
+from router import check_login
+
+
+def make_request(token: str):
+    return SimpleNamespace(
+        headers={"Authorization": f"Bearer {token}"},
+        cookies={},
+        ctx=SimpleNamespace(),
+    )
+
+
+def before(token: str):
+    # 优化前：每次 check_login 都完整验签
+    for _ in range(2):
+        claims = jwt.decode(token, tagentic_config.SECRET_KEY, algorithms=["HS256"])
+        _ = claims['AccountId']
+
+
+def after(token: str):
+    request = make_request(token)
+    for _ in range(2):
+        check_login(request)
+
+
+def bench(fn, token: str, requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        fn(token)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100000)
+    args = parser.parse_args()
+
+    exp = int((datetime.now(UTC) + timedelta(hours=1)).timestamp())
+    token = SessionToken.create({"AccountId": "bench", "token_source": "login_token", "exp": exp})
+
+    print(f"before: {bench(before, token, args.requests):8.2f} us/request")
+    print(f"after:  {bench(after, token, args.requests):8.2f} us/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+分享记录收集基准测试
+
+用一个桩 vendor 模拟 N 轮对话的上游历史（每次 get_messages 计一次上游调用），对比
+优化前（每页 10 条翻完整个会话）与 CoreShareConversation.collect_records（按页大小翻页、
+找齐即停）分享最近 / 较早记录时的上游调用次数。
+
+用法（在 server 目录下）：
+    python -m test.benchmark.bench_share_collect --turns 2000 --page-size 100
+"""
+import argparse
+import asyncio
+import contextlib
+
+from core import share
+from core.share import CoreShareConversation
+
+# 桩 vendor 不读数据库，collect_records 签出的连接用空的上下文代替
+share.db_connection = contextlib.nullcontext
+
+
+class StubVendor:
+    """按时间升序保存记录，get_messages 返回 last_record_id 之前的最后 limit 条"""
+
+    def __init__(self, turns: int):
+        self.records = []
+        for i in range(turns):
+            self.records.append({"RecordId": f"q-{i}", "Role": "user"})
+            self.records.append({"RecordId": f"a-{i}", "Role": "assistant", "RelatedRecordId": f"q-{i}"})
+        self.index = {record["RecordId"]: i for i, record in enumerate(self.records)}
+        self.calls = 0
+
+    async def get_messages(self, db, account_id, conversation_id, limit, last_record_id=None):
+        self.calls += 1
+        end = self.index[last_record_id] if last_record_id else len(self.records)
+        return self.records[max(0, end - limit):end]
+
+
+async def before(vendor: StubVendor, record_ids: list[str]) -> list:
+    # 优化前：ShareCreateApi 每页 10 条翻完整个会话再过滤
+    records = []
+    last_record_id = None
+    while True:
+        _records = await vendor.get_messages(None, "bench", "c-1", 10, last_record_id=last_record_id)
+        records = _records + records
+        if len(_records) > 0:
+            last_record_id = _records[0]["RecordId"]
+        else:
+            break
+    return [record for record in records if record["RecordId"] in record_ids]
+
+
+async def after(vendor: StubVendor, record_ids: list[str], page_size: int) -> list:
+    return await CoreShareConversation.collect_records(vendor, "bench", "c-1", record_ids, page_size)
+
+
+async def run(turns: int, page_size: int):
+    cases = {
+        "latest turn": [f"q-{turns - 1}", f"a-{turns - 1}"],
+        "middle turn": [f"q-{turns // 2}", f"a-{turns // 2}"],
+        "first turn": ["q-0", "a-0"],
+    }
+    for name, record_ids in cases.items():
+        old_vendor, new_vendor = StubVendor(turns), StubVendor(turns)
+        expected = await before(old_vendor, record_ids)
+        result = await after(new_vendor, record_ids, page_size)
+        assert result == expected, name
+        print(f"{name:12s} before: {old_vendor.calls:5d} calls   after: {new_vendor.calls:5d} calls")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args.turns, args.page_size))
+
+
+if __name__ == "__main__":
+    main()
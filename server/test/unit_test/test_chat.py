@@ -1,4 +1,7 @@
+import asyncio
 import json
+import uuid
+
 import pytest
 
 
@@ -48,3 +51,34 @@ async def test_error_asgi_client(app, auth_token):
     resp_dict = json.loads(response.body.decode())
     assert isinstance(resp_dict, list)
     assert len(resp_dict) == n_conversations + 1
+
+
+@pytest.mark.asyncio
+async def test_stop_cancels_in_flight_stream(app, auth_token):
+    from core.stream import CoreChatStream
+
+    headers = {
+        "Authorization": f"Bearer {auth_token}",
+    }
+    request, response = await app.asgi_client.get("/account/info", headers=headers)
+    account_id = json.loads(response.body.decode())["Info"]["Id"]
+
+    async def source(_):
+        await asyncio.sleep(3600)
+        yield b""
+
+    stream = CoreChatStream.start(account_id, source, conversation_id=str(uuid.uuid4()))
+    await asyncio.sleep(0)
+
+    request, response = await app.asgi_client.post(
+        "/chat/message/stop", headers=headers, data=json.dumps({"StreamId": stream.id}),
+    )
+    assert response.status == 200
+    await asyncio.gather(stream.producer, return_exceptions=True)
+    assert stream.done
+
+    # 停止已结束或不存在的生成不报错
+    request, response = await app.asgi_client.post(
+        "/chat/message/stop", headers=headers, data=json.dumps({"StreamId": "unknown"}),
+    )
+    assert response.status == 200
@@ -0,0 +1,76 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+
+from core.conversation import CoreConversation, ConversationWriteBehind
+
+
+def test_write_behind_keeps_latest_update_and_title():
+    ConversationWriteBehind._pending = {}
+    first, second = datetime(2025, 1, 1, 10, 0, 0), datetime(2025, 1, 1, 10, 0, 5)
+
+    ConversationWriteBehind.add("conversation-1", first, "标题")
+    ConversationWriteBehind.add("conversation-1", second)
+
+    assert ConversationWriteBehind._pending == {"conversation-1": (second, "标题")}
+    assert ConversationWriteBehind.stats()["pending"] == 1
+    ConversationWriteBehind._pending = {}
+
+
+@pytest_asyncio.fixture
+async def conversation_db(app):
+    from sqlalchemy import delete
+    from model.chat import ChatConversation
+    from util.database import create_db_engine
+
+    engine, make_session = create_db_engine(app)
+    async with engine.begin() as conn:
+        await conn.run_sync(ChatConversation.__table__.create, checkfirst=True)
+    account_id = str(uuid.uuid4())
+    db = make_session()
+    try:
+        yield db, account_id
+    finally:
+        await db.rollback()
+        await db.execute(delete(ChatConversation).where(ChatConversation.AccountId == account_id))
+        await db.commit()
+        await db.close()
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_list_page_walks_conversations_by_cursor(conversation_db):
+    from model.chat import ChatConversation
+
+    db, account_id = conversation_db
+    now = datetime(2025, 1, 1, 10, 0, 0)
+    # 两条会话 LastActiveAt 相同，按 Id 决定先后
+    active_at = [now, now - timedelta(minutes=1), now - timedelta(minutes=1), now - timedelta(minutes=2)]
+    conversations = [
+        ChatConversation(
+            Id=str(uuid.uuid4()), AccountId=account_id, ApplicationId="app-1", Title=f"c{i}", LastActiveAt=at,
+        )
+        for i, at in enumerate(active_at)
+    ]
+    db.add_all(conversations)
+    db.add(ChatConversation(
+        Id=str(uuid.uuid4()), AccountId=account_id, ApplicationId="app-2", Title="other", LastActiveAt=now,
+    ))
+    await db.commit()
+    expected = [
+        str(c.Id) for c in sorted(conversations, key=lambda c: (-c.LastActiveAt.timestamp(), uuid.UUID(str(c.Id))))
+    ]
+
+    page, cursor = await CoreConversation.list_page(db, account_id, "app-1", limit=3)
+    assert [str(c.Id) for c in page] == expected[:3]
+    assert cursor is not None
+
+    page, cursor = await CoreConversation.list_page(db, account_id, "app-1", limit=3, cursor=cursor)
+    assert [str(c.Id) for c in page] == expected[3:]
+    assert cursor is None
+
+    page, cursor = await CoreConversation.list_page(db, account_id, limit=10)
+    assert len(page) == 5
+    assert cursor is None
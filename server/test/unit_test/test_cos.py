@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import pytest
+
+from util import cos
+
+
+async def max_loop_lag(coro, interval=0.01) -> float:
+    """运行 coro 期间事件循环的最大调度延迟（秒）"""
+    lag = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal lag
+        while not done:
+            start = time.monotonic()
+            await asyncio.sleep(interval)
+            lag = max(lag, time.monotonic() - start - interval)
+
+    task = asyncio.ensure_future(ticker())
+    await asyncio.sleep(interval)
+    try:
+        await coro
+    finally:
+        done = True
+        await task
+    return lag
+
+
+@pytest.mark.asyncio
+async def test_cos_calls_do_not_block_event_loop(monkeypatch):
+    def slow(*args, **kwargs):
+        # 模拟 head_object / put_object / requests.get 等阻塞网络调用
+        time.sleep(0.3)
+        return "ok"
+
+    monkeypatch.setattr(cos, "upload", slow)
+    monkeypatch.setattr(cos, "get_presigned_download_url", slow)
+    monkeypatch.setattr(cos, "get_presigned_preview_url", slow)
+
+    async def calls():
+        await cos.upload_async(stream=None, path="a/b.txt", if_changed=True)
+        await cos.get_presigned_download_url_async(key="a/b.txt")
+        await cos.get_presigned_preview_url_async(key="a/b.txt")
+
+    lag = await max_loop_lag(calls())
+
+    assert lag < 0.1
+    stats = cos.cos_executor.stats()
+    assert stats["calls"] >= 3
+    assert stats["in_flight"] == 0
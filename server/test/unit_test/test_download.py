@@ -0,0 +1,144 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from util.download import RangeNotSatisfiable, parse_range, if_range_matches, slice_chunks
+
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-1000", 100) == (50, 99)
+    # 多区间与无法识别的格式按完整内容返回
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range("items=0-1", 100) is None
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=100-", 100)
+
+
+def test_if_range_matches():
+    assert if_range_matches(None, '"v1"', None)
+    assert if_range_matches('"v1"', '"v1"', None)
+    assert not if_range_matches('"v0"', '"v1"', None)
+    assert if_range_matches("Wed, 21 Oct 2015 07:28:00 GMT", None, "Wed, 21 Oct 2015 07:28:00 GMT")
+    assert not if_range_matches("Wed, 21 Oct 2015 07:28:00 GMT", '"v1"', None)
+
+
+@pytest.mark.asyncio
+async def test_slice_chunks():
+    async def chunks():
+        for chunk in (b"0123", b"4567", b"89ab"):
+            yield chunk
+
+    assert b"".join([chunk async for chunk in slice_chunks(chunks(), 2, 9)]) == b"23456789"
+    assert b"".join([chunk async for chunk in slice_chunks(chunks(), 0, 0)]) == b"0"
+
+
+def _file_download_module(app) -> dict:
+    """router 下的模块由 autodiscover 按文件加载（不在 sys.modules 中），再次 import 会重复注册路由；
+    从已注册的路由取到实际生效的模块命名空间"""
+    view = app.router.routes_all[("file", "download")].handler.view_class
+    return view.get.__wrapped__.__globals__
+
+
+class _FakeContent:
+    def __init__(self, body: bytes):
+        self.body = body
+
+    async def iter_chunked(self, size):
+        for i in range(0, len(self.body), 4):
+            yield self.body[i:i + 4]
+
+
+class _FakeUpstream:
+    """上游未处理 Range，总是返回 200 完整内容"""
+
+    def __init__(self, body: bytes):
+        self.status = 200
+        self.content_length = len(body)
+        self.headers = {'Content-Length': str(len(body)), 'Content-Type': 'text/plain', 'ETag': '"v1"'}
+        self.content = _FakeContent(body)
+
+
+def _fake_open_file_content(body: bytes, closed: list):
+    @asynccontextmanager
+    async def open_file_content(app_id, workspace_id, path, headers=None):
+        try:
+            yield _FakeUpstream(body)
+        finally:
+            closed.append(path)
+    return open_file_content
+
+
+async def _download(app, auth_token, monkeypatch, range_header):
+    application_id = next(iter(app.apps.keys()))
+    closed = []
+    monkeypatch.setattr(
+        app.apps[application_id], 'open_file_content', _fake_open_file_content(b'0123456789ab', closed), raising=False,
+    )
+    request, response = await app.asgi_client.get(
+        f'/file/download?ApplicationId={application_id}&AppId=a&WorkspaceId=w&Path=/workdir/a.txt',
+        headers={'Authorization': f'Bearer {auth_token}', 'Range': range_header},
+    )
+    return response, closed
+
+
+@pytest.mark.asyncio
+async def test_download_emulates_range_with_206(app, auth_token, monkeypatch):
+    file_download = _file_download_module(app)
+
+    response, closed = await _download(app, auth_token, monkeypatch, 'bytes=2-5')
+
+    assert response.status == 206
+    assert response.headers['Content-Range'] == 'bytes 2-5/12'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.body == b'2345'
+    assert closed == ['/workdir/a.txt']
+    assert not file_download['_active_downloads']
+
+
+@pytest.mark.asyncio
+async def test_download_unsatisfiable_range_returns_416(app, auth_token, monkeypatch):
+    file_download = _file_download_module(app)
+
+    response, closed = await _download(app, auth_token, monkeypatch, 'bytes=100-')
+
+    assert response.status == 416
+    assert response.headers['Content-Range'] == 'bytes */12'
+    assert response.body == b''
+    assert closed == ['/workdir/a.txt']
+    assert not file_download['_active_downloads']
+
+
+@pytest.mark.asyncio
+async def test_download_slot_is_released_when_response_never_streams(app, auth_token, monkeypatch):
+    file_download = _file_download_module(app)
+
+    monkeypatch.setitem(file_download, '_STREAM_START_TIMEOUT', 0)
+    application_id = next(iter(app.apps.keys()))
+    closed = []
+    monkeypatch.setattr(
+        app.apps[application_id], 'open_file_content', _fake_open_file_content(b'0123', closed), raising=False,
+    )
+
+    class _Request:
+        args = {}
+        headers = {}
+
+    request = _Request()
+    request.ctx = type('ctx', (), {'account_id': 'acc-never-streamed'})()
+    monkeypatch.setattr(file_download['reqparse'].RequestParser, 'parse_args', lambda self, req: {
+        'ApplicationId': application_id, 'AppId': 'a', 'WorkspaceId': 'w', 'Path': '/workdir/a.txt',
+    })
+
+    # 直接调用未包装的处理函数，返回响应后不发送
+    view = file_download['FileDownloadApi']
+    await view.get.__wrapped__(view(), request)
+    assert file_download['_active_downloads'] == {'acc-never-streamed': 1}
+
+    await asyncio.sleep(0.01)
+    assert closed == ['/workdir/a.txt']
+    assert 'acc-never-streamed' not in file_download['_active_downloads']
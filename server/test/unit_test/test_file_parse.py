@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from util.cache import StreamFlight
+from util.helper import doc_parse_success
+from vendor.tcadp import tcadp as tcadp_module
+from vendor.tcadp.tcadp import TCADP
+
+
+@pytest.mark.asyncio
+async def test_stream_flight_fans_out_to_late_subscribers():
+    flight = StreamFlight()
+    calls = 0
+
+    async def produce():
+        nonlocal calls
+        calls += 1
+        for i in range(3):
+            await asyncio.sleep(0.01)
+            yield i
+
+    async def collect():
+        return [chunk async for chunk in flight.subscribe("k", produce)]
+
+    first = asyncio.ensure_future(collect())
+    await asyncio.sleep(0.015)
+    second = asyncio.ensure_future(collect())
+
+    assert await first == [0, 1, 2]
+    assert await second == [0, 1, 2]
+    assert calls == 1
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_parse_document_replays_cached_success(monkeypatch):
+    calls = 0
+
+    async def fake_parse(self, data):
+        nonlocal calls
+        calls += 1
+        yield b'data: {"type":"status","payload":{"doc_id":"0","process":50,"status":"RUNNING"}}\n'
+        yield b'data: {"type":"status","payload":{"doc_id":"123","process":100,"status":"SUCCESS"}}\n'
+
+    monkeypatch.setattr(TCADP, "_parse_document", fake_parse)
+    monkeypatch.setattr(tcadp_module.tagentic_config, "TC_DOC_PARSE_CACHE_TTL", 60)
+    vendor_app = TCADP({"AppKey": "app-key"}, "app-1")
+
+    async def parse():
+        return [chunk async for chunk in vendor_app.parse_document(
+            "account-1", "a.pdf", "pdf", cos_hash="hash-1", size="10",
+        )]
+
+    first, second = await asyncio.gather(parse(), parse())
+    assert calls == 1
+    assert first == second and len(first) == 2
+
+    replayed = await parse()
+    assert calls == 1
+    assert len(replayed) == 1
+    assert b'"doc_id": "123"' in replayed[0] and b'"SUCCESS"' in replayed[0]
+
+
+@pytest.mark.asyncio
+async def test_parse_document_is_not_shared_across_sessions(monkeypatch):
+    sessions = []
+
+    async def fake_parse(self, data):
+        sessions.append(data.get("session_id"))
+        yield b'data: {"type":"status","payload":{"doc_id":"123","process":100,"status":"SUCCESS"}}\n'
+
+    monkeypatch.setattr(TCADP, "_parse_document", fake_parse)
+    monkeypatch.setattr(tcadp_module.tagentic_config, "TC_DOC_PARSE_CACHE_TTL", 60)
+    vendor_app = TCADP({"AppKey": "app-key"}, "app-1")
+
+    async def parse(account_id, conversation_id):
+        return [chunk async for chunk in vendor_app.parse_document(
+            account_id, "b.pdf", "pdf", cos_hash="hash-2", size="10", conversation_id=conversation_id,
+        )]
+
+    await asyncio.gather(parse("account-1", "c-1"), parse("account-1", "c-2"), parse("account-2", "c-1"))
+    # 解析与会话绑定：不同账户 / 会话各自请求上游，同一会话再次解析命中缓存
+    assert sorted(sessions) == ["c-1", "c-1", "c-2"]
+    await parse("account-1", "c-2")
+    assert len(sessions) == 3
+
+
+def test_doc_parse_success_extracts_payload():
+    running = b'data: {"type":"status","payload":{"doc_id":"0","process":50,"status":"RUNNING"}}\n'
+    success = b'data: {"type":"status","payload":{"doc_id":"123","process":99,"status":"SUCCESS"}}\n'
+
+    assert doc_parse_success(running) is None
+    assert doc_parse_success(running + success) == {"doc_id": "123", "process": 100, "status": "SUCCESS"}
@@ -1,5 +1,6 @@
 import json
 import pytest
+from core.share import CoreShareConversation
 from vendor.tcadp.tcadp import TCADP
 
 
@@ -92,3 +93,38 @@ async def test_tcadp_reference_detail_keeps_pascal_case_fields(monkeypatch):
             "Name": "2412.19437v2.pdf",
         }
     ]
+
+
+@pytest.mark.asyncio
+async def test_tcadp_reference_detail_cache_fetches_missing_ids_only(monkeypatch):
+    vendor_app = TCADP(config={"AppId": "bot-1"}, application_id="app-reference-cache")
+    requested = []
+
+    async def fake_tc_request(config, action, payload, **kwargs):
+        requested.append(payload["ReferBizIds"])
+        return {"Response": {"List": [
+            {"ReferBizId": refer_id, "DocName": f"{refer_id}.pdf"}
+            for refer_id in payload["ReferBizIds"] if refer_id != "unknown"
+        ]}}
+
+    monkeypatch.setattr("vendor.tcadp.tcadp.tc_request", fake_tc_request)
+
+    first = await vendor_app.get_reference_details(None, ["r-1", "unknown"])
+    second = await vendor_app.get_reference_details(None, ["r-2", "unknown", "r-1"])
+
+    assert requested == [["r-1", "unknown"], ["r-2"]]
+    assert [detail["Id"] for detail in first] == ["r-1"]
+    assert [detail["Id"] for detail in second] == ["r-2", "r-1"]
+
+
+def test_share_reference_ids_collects_type2_references():
+    records = [{
+        "Messages": [{"Contents": [{"References": [
+            {"Type": 2, "Id": "r-1"},
+            {"Type": 1, "Id": "web-1"},
+            {"Type": 2, "DocRefer": {"ReferBizId": "r-2"}},
+            {"Type": 2, "Id": "r-1"},
+        ]}]}],
+    }]
+
+    assert CoreShareConversation.reference_ids(records) == ["r-1", "r-2"]
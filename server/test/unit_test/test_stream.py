@@ -0,0 +1,142 @@
+import asyncio
+import json
+
+import pytest
+
+from core.stream import CoreStream, CoreChatStream
+
+
+def _delta(text, message_id="m-1", content_index=0):
+    frame = {"Type": "text.delta", "MessageId": message_id, "ContentIndex": content_index, "Text": text}
+    return f'data: {json.dumps(frame)}\n\n'.encode('utf-8')
+
+
+async def _frames(*frames):
+    for frame in frames:
+        yield frame
+
+
+@pytest.mark.asyncio
+async def test_coalesce_merges_deltas_and_flushes_on_other_events():
+    done = b'data: {"Type":"message.done","MessageId":"m-1"}\n\n'
+    source = _frames(_delta("你"), _delta("好"), _delta("!", content_index=1), done)
+
+    frames = [frame async for frame in CoreStream.coalesce(source, window_ms=1000)]
+
+    assert len(frames) == 3
+    assert json.loads(frames[0][5:])["Text"] == "你好"
+    assert json.loads(frames[1][5:])["ContentIndex"] == 1
+    assert frames[2] == done
+
+
+@pytest.mark.asyncio
+async def test_coalesce_flushes_when_max_bytes_reached():
+    source = _frames(_delta("ab"), _delta("cd"), _delta("e"))
+
+    frames = [frame async for frame in CoreStream.coalesce(source, window_ms=1000, max_bytes=4)]
+
+    assert [json.loads(frame[5:])["Text"] for frame in frames] == ["abcd", "e"]
+
+
+@pytest.mark.asyncio
+async def test_coalesce_splices_escaped_text_without_reencoding():
+    raw = 'data:{"Type":"text.delta","MessageId":"m-1","ContentIndex":0,"Text":"你"}\n\n'.encode('utf-8')
+    source = _frames(raw, _delta('"引号"\\'), _delta("x", message_id="m-2"))
+
+    frames = [frame async for frame in CoreStream.coalesce(source, window_ms=1000)]
+
+    # 第一帧的其余字节原样保留，只拼接 Text 的转义字符串
+    assert frames[0].startswith(b'data:{"Type":"text.delta","MessageId":"m-1"')
+    assert json.loads(frames[0][5:])["Text"] == '你"引号"\\'
+    assert json.loads(frames[1][5:])["MessageId"] == "m-2"
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_replays_from_last_event_id():
+    stream = CoreChatStream.start("account-1", lambda _: _frames(_delta("a"), _delta("b"), _delta("c")))
+
+    first = [event async for event in CoreChatStream.subscribe(stream)]
+    resumed = [event async for event in CoreChatStream.subscribe(stream, last_event_id=2)]
+
+    assert [event.split(b'\n', 1)[0] for event in first] == [b'id: 1', b'id: 2', b'id: 3']
+    assert resumed == first[2:]
+    assert CoreChatStream.get("account-2", stream_id=stream.id) is None
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_fans_out_to_multiple_subscribers():
+    stream = CoreChatStream.start("account-1", lambda _: _frames(_delta("a"), _delta("b")))
+
+    async def read():
+        return [event async for event in CoreChatStream.subscribe(stream)]
+
+    first, second = await asyncio.gather(read(), read())
+
+    assert first == second
+    assert len(first) == 2
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_is_in_flight_for_its_conversation_from_start():
+    started = asyncio.Event()
+
+    async def source(_):
+        started.set()
+        await asyncio.sleep(3600)
+        yield _delta("a")
+
+    stream = CoreChatStream.start("account-1", source, conversation_id="conversation-1")
+
+    # 生成尚未产出任何事件时，同一会话的重复请求也能找到它
+    assert CoreChatStream.in_flight("account-1", "conversation-1") is stream
+    assert CoreChatStream.in_flight("account-2", "conversation-1") is None
+    await started.wait()
+    stream.producer.cancel()
+    await asyncio.gather(stream.producer, return_exceptions=True)
+    assert CoreChatStream.in_flight("account-1", "conversation-1") is None
+
+
+@pytest.mark.asyncio
+async def test_resent_message_attaches_but_new_message_restarts():
+    started = []
+
+    def source_factory(name):
+        async def source(_):
+            started.append(name)
+            await asyncio.sleep(3600)
+            yield _delta(name)
+        return source
+
+    first_hash = CoreChatStream.request_hash([{"Type": "text", "Text": "a"}], True, {}, False)
+    first, attached = CoreChatStream.attach_or_start("account-1", source_factory("a"), "conversation-2", first_hash)
+    assert not attached
+    await asyncio.sleep(0)
+
+    # 重发同一条消息：接入进行中的生成
+    same_hash = CoreChatStream.request_hash([{"Type": "text", "Text": "a"}], True, {}, False)
+    stream, attached = CoreChatStream.attach_or_start("account-1", source_factory("a2"), "conversation-2", same_hash)
+    assert attached and stream is first
+
+    # 新消息：取消旧的生成，以新消息重新开始
+    new_hash = CoreChatStream.request_hash([{"Type": "text", "Text": "b"}], True, {}, False)
+    second, attached = CoreChatStream.attach_or_start("account-1", source_factory("b"), "conversation-2", new_hash)
+    assert not attached and second is not first
+    await asyncio.gather(first.producer, return_exceptions=True)
+    assert first.done
+    assert CoreChatStream.in_flight("account-1", "conversation-2") is second
+    assert started == ["a", "b"]
+
+    CoreChatStream.cancel(second)
+    await asyncio.gather(second.producer, return_exceptions=True)
+    assert CoreChatStream.in_flight("account-1", "conversation-2") is None
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_cancelled_before_it_runs_is_finished():
+    stream = CoreChatStream.start("account-1", lambda _: _frames(_delta("a")), conversation_id="conversation-3")
+    CoreChatStream.cancel(stream)
+    await asyncio.gather(stream.producer, return_exceptions=True)
+
+    assert stream.done
+    assert CoreChatStream.in_flight("account-1", "conversation-3") is None
+    assert [event async for event in CoreChatStream.subscribe(stream)] == []
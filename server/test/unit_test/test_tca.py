@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from util.cache import SingleFlight
+from util.tca import _parse_action_version_raw, action_cache_policy
+
+
+def test_action_version_cache_policy():
+    overrides = _parse_action_version_raw({
+        "DescribeApp": {"service": "adp", "cache.ttl": 60, "cache.key": ["AppId"]},
+        "ModifyAgent": {"service": "adp"},
+    })
+
+    assert action_cache_policy("DescribeApp", overrides) == {"ttl": 60.0, "key": ["AppId"]}
+    assert action_cache_policy("ModifyAgent", overrides) is None
+    assert action_cache_policy("Unknown", overrides) is None
+
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"calls": calls}
+
+    results = await asyncio.gather(*(flight.do("k", load) for _ in range(5)))
+
+    assert calls == 1
+    assert all(result is results[0] for result in results)
+    assert len(flight) == 0
+    assert (await flight.do("k", load)) == {"calls": 2}
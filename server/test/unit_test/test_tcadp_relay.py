@@ -0,0 +1,225 @@
+import asyncio
+import contextlib
+import json
+import uuid
+
+import pytest
+import pytest_asyncio
+
+from core.history import ChatHistoryCapture, CoreChatHistory
+from vendor.interface import Record
+from vendor.tcadp.tcadp import TCADP
+
+
+def test_tcadp_relay_forwards_data_frame_unchanged():
+    raw_line = 'data:{"Type":"text.delta","MessageId":"m-1","ContentIndex":0,"Text":"你好"}\r\n'.encode()
+
+    frame = TCADP._relay_sse_frame(raw_line, "conversation-1")
+
+    assert frame == raw_line.rstrip(b'\r\n') + b'\n\n'
+
+
+def test_tcadp_relay_skips_non_data_and_broken_frames():
+    assert TCADP._relay_sse_frame(b'\n', "conversation-1") is None
+    assert TCADP._relay_sse_frame(b'event:ping\n', "conversation-1") is None
+    assert TCADP._relay_sse_frame(b'data:{"Type":"error",\n', "conversation-1") is None
+
+
+def test_tcadp_relay_captures_completed_turn():
+    capture = ChatHistoryCapture("conversation-1", is_new_conversation=True)
+    user = {"Role": "user", "RecordId": "r-1", "Messages": [
+        {"Type": "reply", "Contents": [{"Type": "text", "Text": "hi"}]},
+    ]}
+    assistant = {"Role": "assistant", "RecordId": "r-2", "RelatedRecordId": "r-1", "Messages": [{"Type": "reply"}]}
+
+    request_ack = json.dumps({"Type": "request_ack", "RequestAck": user})
+    TCADP._relay_sse_frame(f'data:{request_ack}\n'.encode(), "conversation-1", capture)
+    assert capture.turn() is None
+
+    completed = json.dumps({"Type": "response.completed", "Response": assistant})
+    TCADP._relay_sse_frame(b'data:{"Type":"text.delta","Text":"hello"}\n', "conversation-1", capture)
+    TCADP._relay_sse_frame(f'data:{completed}\n'.encode(), "conversation-1", capture)
+    assert capture.turn() == [user, assistant]
+
+
+def test_tcadp_relay_ignores_nested_type_before_top_level_type():
+    capture = ChatHistoryCapture("conversation-1", is_new_conversation=True)
+    user = {"Role": "user", "RecordId": "r-1", "Messages": [
+        {"Type": "reply", "Contents": [{"Type": "text", "Text": "hi"}]},
+    ]}
+    assistant = {"Role": "assistant", "RecordId": "r-2", "Messages": [
+        {"Type": "reply", "Contents": [{"Type": "text", "Text": "ok"}]},
+    ]}
+
+    # 顶层 Type 不在第一个键时，嵌套的 "Type":"reply" / "Type":"text" 不能被当作事件类型
+    request_ack = json.dumps({"RequestAck": user, "Type": "request_ack"})
+    completed = json.dumps({"Response": assistant, "Type": "response.completed"})
+    TCADP._relay_sse_frame(f'data:{request_ack}\n'.encode(), "conversation-1", capture)
+    TCADP._relay_sse_frame(f'data:{completed}\n'.encode(), "conversation-1", capture)
+    assert capture.turn() == [user, assistant]
+
+
+@pytest.fixture
+def upstream_turn():
+    """同一轮对话：DescribeConversationMessageList 返回的扁平消息，以及 chat SSE 中携带的完整 Record"""
+    contents = {"m-1": [{"Type": "text", "Text": "hi"}], "m-2": [{"Type": "text", "Text": "hello"}]}
+    messages = [
+        {"RecordId": "r-1", "Role": "user", "ConversationId": "c-1", "Status": "completed", "StatusDesc": "",
+         "Type": "reply", "MessageId": "m-1", "Name": "", "Title": "", "Icon": "", "Contents": contents["m-1"]},
+        {"RecordId": "r-2", "Role": "assistant", "ConversationId": "c-1", "Status": "completed", "StatusDesc": "",
+         "Type": "reply", "MessageId": "m-2", "Name": "", "Title": "", "Icon": "", "Contents": contents["m-2"]},
+    ]
+    user = {
+        "Role": "user", "RecordId": "r-1", "ConversationId": "c-1", "Status": "completed", "StatusDesc": "",
+        "Messages": [{"Type": "reply", "MessageId": "m-1", "Name": "", "Title": "", "Icon": "",
+                      "Status": "completed", "StatusDesc": "", "Contents": contents["m-1"]}],
+    }
+    assistant = {
+        "Role": "assistant", "RecordId": "r-2", "RelatedRecordId": "r-1", "ConversationId": "c-1",
+        "Status": "completed", "StatusDesc": "",
+        "Messages": [{"Type": "reply", "MessageId": "m-2", "Name": "", "Title": "", "Icon": "",
+                      "Status": "completed", "StatusDesc": "", "Contents": contents["m-2"]}],
+    }
+    frames = [
+        f'data:{json.dumps({"Type": "request_ack", "RequestAck": user})}\n'.encode(),
+        b'data:{"Type":"text.delta","MessageId":"m-2","ContentIndex":0,"Text":"hel"}\n',
+        b'data:{"Type":"text.delta","MessageId":"m-2","ContentIndex":0,"Text":"lo"}\n',
+        f'data:{json.dumps({"Type": "response.completed", "Response": assistant})}\n'.encode(),
+    ]
+    return frames, messages
+
+
+def test_captured_turn_matches_upstream_history(upstream_turn):
+    frames, messages = upstream_turn
+    capture = ChatHistoryCapture("c-1", is_new_conversation=True)
+    for frame in frames:
+        TCADP._relay_sse_frame(frame, "c-1", capture)
+
+    captured = [Record.model_validate(record).model_dump(exclude_none=True) for record in capture.turn()]
+    upstream = [
+        Record.model_validate(record).model_dump(exclude_none=True)
+        for record in TCADP._convert_messages_to_records(messages, "c-1")
+    ]
+
+    # 本地保存的记录至少包含上游历史接口返回的全部字段且取值一致（SSE 中另有 RelatedRecordId 等字段）
+    assert len(captured) == len(upstream)
+    for local, remote in zip(captured, upstream):
+        assert {key: local.get(key) for key in remote} == remote
+
+
+@pytest.mark.asyncio
+async def test_backfill_is_scheduled_once_per_interval(monkeypatch):
+    calls = []
+
+    async def fake_backfill(conversation_id, source, fetch_page):
+        calls.append(conversation_id)
+        CoreChatHistory._backfilling.discard(conversation_id)
+
+    monkeypatch.setattr(CoreChatHistory, "_backfill", fake_backfill)
+    monkeypatch.setattr(CoreChatHistory, "_attempted", CoreChatHistory._attempted.__class__(maxsize=16, ttl=60))
+
+    for _ in range(3):
+        CoreChatHistory.schedule_backfill("c-backfill", "GetMsgRecord", None)
+        await asyncio.gather(*CoreChatHistory._tasks)
+    assert calls == ["c-backfill"]
+
+
+@pytest_asyncio.fixture
+async def history_db(app, monkeypatch):
+    from model.chat import ChatHistoryRecord, ChatHistoryState
+    from util.database import create_db_engine
+
+    engine, make_session = create_db_engine(app)
+    async with engine.begin() as conn:
+        await conn.run_sync(ChatHistoryRecord.__table__.create, checkfirst=True)
+        await conn.run_sync(ChatHistoryState.__table__.create, checkfirst=True)
+
+    @contextlib.asynccontextmanager
+    async def db_connection():
+        db = make_session()
+        try:
+            yield db
+        finally:
+            await db.close()
+
+    monkeypatch.setattr("core.history.db_connection", db_connection)
+    conversation_id = str(uuid.uuid4())
+    db = make_session()
+    try:
+        yield db, conversation_id
+    finally:
+        await db.rollback()
+        await CoreChatHistory.delete(db, conversation_id)
+        await db.commit()
+        await db.close()
+        await engine.dispose()
+
+
+def _captured_turn(conversation_id, upstream_turn, is_new_conversation=True):
+    frames, _ = upstream_turn
+    capture = ChatHistoryCapture(conversation_id, is_new_conversation=is_new_conversation)
+    for frame in frames:
+        TCADP._relay_sse_frame(frame, conversation_id, capture)
+    return capture
+
+
+@pytest.mark.asyncio
+async def test_relay_history_serves_claw_mode_only(history_db, upstream_turn):
+    db, conversation_id = history_db
+    await CoreChatHistory.save_turn(_captured_turn(conversation_id, upstream_turn))
+
+    records, has_more = await CoreChatHistory.load(db, conversation_id, "DescribeConversationMessageList", 10)
+    assert [record["RecordId"] for record in records] == ["r-1", "r-2"]
+    assert not has_more
+    # standard 模式（GetMsgRecord）的返回与 SSE 中的 Record 不同，回源上游
+    assert await CoreChatHistory.load(db, conversation_id, "GetMsgRecord", 10) is None
+    assert await CoreChatHistory.get_records(db, conversation_id, "GetMsgRecord", ["r-1"]) is None
+
+
+@pytest.mark.asyncio
+async def test_turn_on_get_msg_record_history_invalidates_it(history_db, upstream_turn):
+    from sqlalchemy.dialects.postgresql import insert
+    from model.chat import ChatHistoryState
+
+    db, conversation_id = history_db
+    await db.execute(insert(ChatHistoryState).values(
+        ConversationId=conversation_id, Complete=True, Source="GetMsgRecord",
+    ))
+    await db.commit()
+    assert await CoreChatHistory.load(db, conversation_id, "GetMsgRecord", 10) == ([], False)
+
+    await CoreChatHistory.save_turn(_captured_turn(conversation_id, upstream_turn, is_new_conversation=False))
+    assert await CoreChatHistory.load(db, conversation_id, "GetMsgRecord", 10) is None
+
+
+@pytest.mark.asyncio
+async def test_rate_score_is_kept_in_local_history(history_db, upstream_turn):
+    db, conversation_id = history_db
+    await CoreChatHistory.save_turn(_captured_turn(conversation_id, upstream_turn))
+
+    await CoreChatHistory.set_score(db, conversation_id, "r-2", 2)
+    await db.commit()
+
+    records, _ = await CoreChatHistory.load(db, conversation_id, "DescribeConversationMessageList", 10)
+    assert [record.get("Score") for record in records] == [None, 2]
+    assert records[1]["Messages"][0]["Contents"] == [{"Type": "text", "Text": "hello"}]
+
+
+@pytest.mark.asyncio
+async def test_tcadp_rate_updates_local_history(history_db, upstream_turn, monkeypatch):
+    db, conversation_id = history_db
+    await CoreChatHistory.save_turn(_captured_turn(conversation_id, upstream_turn))
+    requested = []
+
+    async def fake_tc_request(config, action, payload, **kwargs):
+        requested.append((action, payload["Score"]))
+        return {"Response": {}}
+
+    monkeypatch.setattr("vendor.tcadp.tcadp.tc_request", fake_tc_request)
+    vendor_app = TCADP({"AppKey": "app-key", "LocalHistory": True}, "app-rate")
+
+    await vendor_app.rate(db, "account-1", conversation_id, "r-2", 1)
+
+    assert requested == [("RateMsgRecord", 1)]
+    records, _ = await CoreChatHistory.load(db, conversation_id, "DescribeConversationMessageList", 10)
+    assert records[1]["Score"] == 1
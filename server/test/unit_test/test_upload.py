@@ -0,0 +1,235 @@
+import json
+import uuid
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from sanic.exceptions import SanicException
+
+from core.session import SessionToken
+from core.error.account import AccountUnauthorized
+from util.upload import RequestBodyStream, create_upload_token, check_upload_token, complete_multipart_body
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    async def read(self):
+        return self.chunks.pop(0) if self.chunks else None
+
+
+def make_request(chunks, content_length=None):
+    headers = {} if content_length is None else {"content-length": str(content_length)}
+    return SimpleNamespace(headers=headers, stream=FakeStream(chunks))
+
+
+@pytest.mark.asyncio
+async def test_request_body_stream_yields_chunks():
+    body = RequestBodyStream(make_request([b"ab", b"cd"], content_length=4), max_size=10)
+
+    assert [chunk async for chunk in body] == [b"ab", b"cd"]
+    assert body.length == 4
+    assert body.size == 4
+
+
+def test_request_body_stream_rejects_declared_oversize():
+    with pytest.raises(SanicException) as e:
+        RequestBodyStream(make_request([], content_length=11), max_size=10)
+    assert e.value.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_request_body_stream_stops_once_limit_is_exceeded():
+    request = make_request([b"x" * 6, b"x" * 6, b"x" * 6])
+    body = RequestBodyStream(request, max_size=10)
+
+    with pytest.raises(SanicException) as e:
+        await body.read()
+
+    assert e.value.status_code == 413
+    assert body.exceeded
+    # 超限后不再继续读取剩余的请求体
+    assert len(request.stream.chunks) == 1
+
+
+def test_upload_token_roundtrip_and_not_a_session_token():
+    token = create_upload_token({"AccountId": "a-1", "Size": 3}, expires=60)
+
+    claims = check_upload_token(token)
+    assert claims["AccountId"] == "a-1"
+    assert claims["Size"] == 3
+    with pytest.raises(AccountUnauthorized):
+        SessionToken.check(token)
+
+
+def test_upload_token_expired():
+    token = create_upload_token({"AccountId": "a-1"}, expires=-1)
+
+    with pytest.raises(SanicException) as e:
+        check_upload_token(token)
+    assert e.value.status_code == 410
+
+
+def test_complete_multipart_body_requires_every_part():
+    body = complete_multipart_body([{"PartNumber": 2, "ETag": '"b"'}, {"PartNumber": 1, "ETag": '"a"'}], 2)
+    assert body == (
+        b'<CompleteMultipartUpload><Part><PartNumber>1</PartNumber><ETag>"a"</ETag></Part>'
+        b'<Part><PartNumber>2</PartNumber><ETag>"b"</ETag></Part></CompleteMultipartUpload>'
+    )
+
+    with pytest.raises(SanicException) as e:
+        complete_multipart_body([{"PartNumber": 1, "ETag": '"a"'}], 2)
+    assert e.value.status_code == 400
+
+
+def test_file_index_scope_and_hash(monkeypatch):
+    from config import tagentic_config
+    from core.file import CoreFileIndex
+
+    digest = "AB" * 32
+    assert CoreFileIndex.normalize_hash(f" {digest} ") == digest.lower()
+    assert CoreFileIndex.normalize_hash("not-a-hash") is None
+
+    monkeypatch.setattr(tagentic_config, "FILE_DEDUPE_SCOPE", "account")
+    assert CoreFileIndex.scope("app", "acc") == "app/acc"
+    monkeypatch.setattr(tagentic_config, "FILE_DEDUPE_SCOPE", "application")
+    assert CoreFileIndex.scope("app", "acc") == "app"
+    # 客户端声明的哈希始终只在本账户内匹配
+    assert CoreFileIndex.scope("app", "acc", trusted=False) == "app/acc"
+
+    monkeypatch.setattr(tagentic_config, "FILE_DEDUPE_TTL", 3600)
+    assert CoreFileIndex.enabled()
+    assert not CoreFileIndex.enabled("claw")
+
+
+@pytest_asyncio.fixture
+async def file_index_db(app):
+    from sqlalchemy import delete
+    from model.file import FileUploadIndex
+    from util.database import create_db_engine
+
+    engine, make_session = create_db_engine(app)
+    async with engine.begin() as conn:
+        await conn.run_sync(FileUploadIndex.__table__.create, checkfirst=True)
+    application_id = f"test-app-{uuid.uuid4().hex}"
+    db = make_session()
+    try:
+        yield db, application_id
+    finally:
+        await db.rollback()
+        await db.execute(delete(FileUploadIndex).where(FileUploadIndex.Scope.startswith(application_id)))
+        await db.commit()
+        await db.close()
+        await engine.dispose()
+
+
+def _upload_result(name):
+    return {"Url": f"https://cos.example.com/{name}", "CosUrl": f"/realtime/{name}", "CosBucket": "bucket"}
+
+
+@pytest.mark.asyncio
+async def test_file_index_record_lookup_and_overwrite(file_index_db, monkeypatch):
+    from config import tagentic_config
+    from core.file import CoreFileIndex
+
+    db, application_id = file_index_db
+    monkeypatch.setattr(tagentic_config, "FILE_DEDUPE_SCOPE", "account")
+    monkeypatch.setattr(tagentic_config, "FILE_DEDUPE_TTL", 3600)
+    digest = "a" * 64
+
+    assert await CoreFileIndex.lookup(db, application_id, "acc", digest) is None
+    await CoreFileIndex.record(db, application_id, "acc", digest, 3, _upload_result("a.pdf"))
+    await db.commit()
+
+    hit = await CoreFileIndex.lookup(db, application_id, "acc", digest)
+    assert hit["CosUrl"] == "/realtime/a.pdf"
+    assert hit["Size"] == 3
+    assert await CoreFileIndex.lookup(db, application_id, "other", digest) is None
+
+    # 同一哈希重新上传：覆盖旧记录
+    await CoreFileIndex.record(db, application_id, "acc", digest, 4, _upload_result("b.pdf"))
+    await db.commit()
+    hit = await CoreFileIndex.lookup(db, application_id, "acc", digest)
+    assert hit["CosUrl"] == "/realtime/b.pdf"
+    assert hit["Size"] == 4
+
+
+@pytest.mark.asyncio
+async def test_file_index_skips_expired_rows(file_index_db, monkeypatch):
+    from sqlalchemy import update
+    from config import tagentic_config
+    from core.file import CoreFileIndex
+    from model.file import FileUploadIndex
+
+    db, application_id = file_index_db
+    monkeypatch.setattr(tagentic_config, "FILE_DEDUPE_TTL", 3600)
+    digest = "b" * 64
+
+    await CoreFileIndex.record(db, application_id, "acc", digest, 1, _upload_result("c.pdf"))
+    await db.execute(
+        update(FileUploadIndex)
+        .where(FileUploadIndex.Scope.startswith(application_id))
+        .values(ExpiresAt=CoreFileIndex._now() - timedelta(seconds=1))
+    )
+    await db.commit()
+
+    assert await CoreFileIndex.lookup(db, application_id, "acc", digest) is None
+
+
+@pytest.mark.asyncio
+async def test_file_index_declared_hash_never_crosses_accounts(file_index_db, monkeypatch):
+    from config import tagentic_config
+    from core.file import CoreFileIndex
+
+    db, application_id = file_index_db
+    monkeypatch.setattr(tagentic_config, "FILE_DEDUPE_SCOPE", "application")
+    monkeypatch.setattr(tagentic_config, "FILE_DEDUPE_TTL", 3600)
+    digest = "c" * 64
+
+    # 服务端计算的哈希：应用内其他账户可命中，上传者本人以声明的哈希查询也可命中
+    await CoreFileIndex.record(db, application_id, "owner", digest, 1, _upload_result("d.pdf"), trusted=True)
+    # 客户端声明的哈希：只写入本账户范围
+    await CoreFileIndex.record(db, application_id, "claimer", "d" * 64, 1, _upload_result("e.pdf"))
+    await db.commit()
+
+    assert await CoreFileIndex.lookup(db, application_id, "other", digest, trusted=True) is not None
+    assert await CoreFileIndex.lookup(db, application_id, "owner", digest) is not None
+    assert await CoreFileIndex.lookup(db, application_id, "other", digest) is None
+    assert await CoreFileIndex.lookup(db, application_id, "other", "d" * 64, trusted=True) is None
+
+
+@pytest.mark.asyncio
+async def test_upload_without_declared_hash_returns_fresh_object(app, file_index_db, monkeypatch):
+    from sanic_restful_api import reqparse
+    from config import tagentic_config
+    from core.file import CoreFileIndex
+
+    db, application_id = file_index_db
+    monkeypatch.setattr(tagentic_config, "FILE_DEDUPE_SCOPE", "application")
+    monkeypatch.setattr(tagentic_config, "FILE_DEDUPE_TTL", 3600)
+    digest = "e" * 64
+    await CoreFileIndex.record(db, application_id, "owner", digest, 1, _upload_result("old.pdf"), trusted=True)
+    await db.commit()
+
+    vendor_app = SimpleNamespace()
+
+    async def upload(db, request, account_id, mime_type, mode='standard'):
+        return {**_upload_result("new.pdf"), "Sha256": digest, "Size": 1}
+
+    vendor_app.upload = upload
+    monkeypatch.setitem(app.apps, application_id, vendor_app)
+    monkeypatch.setattr(reqparse.RequestParser, "parse_args", lambda self, req: {
+        "ApplicationId": application_id, "Type": "application/pdf", "Mode": "standard", "Sha256": None,
+    })
+    request = SimpleNamespace(ctx=SimpleNamespace(db=db, account_id="uploader"))
+
+    # router 下的模块由 autodiscover 加载，从已注册的路由取到处理函数
+    view = app.router.routes_all[("file", "upload")].handler.view_class
+    response = await view.post.__wrapped__(view(), request)
+
+    # 请求体已经上传：返回本次上传的对象，并让索引指向它，不留下无人引用的对象
+    assert json.loads(response.body)["CosUrl"] == "/realtime/new.pdf"
+    hit = await CoreFileIndex.lookup(db, application_id, "other", digest, trusted=True)
+    assert hit["CosUrl"] == "/realtime/new.pdf"
@@ -0,0 +1,166 @@
+import asyncio
+import base64
+import json
+import time
+
+import pytest
+import pytest_asyncio
+
+from vendor.tcadp import tcadp as tcadp_module
+from vendor.tcadp.tcadp import TCADP
+
+
+def make_vendor(monkeypatch, expires_in=600):
+    calls = []
+
+    async def fake_forward_request(self, action, payload, **kwargs):
+        calls.append(payload)
+        await asyncio.sleep(0.01)
+        return {
+            "Credential": {"AccessToken": f"token-{len(calls)}", "ExpiresIn": expires_in},
+            "SandboxStorage": {"Domain": "https://sandbox.example.com", "TokenTag": "X-File-Ticket"},
+        }
+
+    monkeypatch.setattr(TCADP, "forward_request", fake_forward_request)
+    monkeypatch.setattr(tcadp_module, "_workspace_credentials", tcadp_module.LRUCache(maxsize=16))
+    return TCADP({"AppKey": "app-key"}, "app-1"), calls
+
+
+@pytest.mark.asyncio
+async def test_workspace_credential_is_cached_and_coalesced(monkeypatch):
+    vendor_app, calls = make_vendor(monkeypatch)
+
+    results = await asyncio.gather(*(vendor_app._workspace_credential("a", "w") for _ in range(5)))
+    assert len(calls) == 1
+    assert {result[2] for result in results} == {"token-1"}
+
+    assert (await vendor_app._workspace_credential("a", "w"))[2] == "token-1"
+    assert len(calls) == 1
+
+    # 被拒绝的凭证作废后重新申请
+    vendor_app._invalidate_workspace_credential("a", "w", "token-1")
+    assert (await vendor_app._workspace_credential("a", "w"))[2] == "token-2"
+    assert len(calls) == 2
+
+
+@pytest_asyncio.fixture
+async def background_tasks(monkeypatch):
+    """结束时取消并回收测试期间新建的后台刷新任务，避免泄漏到后续测试"""
+    monkeypatch.setattr(tcadp_module, "_workspace_refreshing", set())
+    before = set(tcadp_module._background_tasks)
+    yield
+    leaked = set(tcadp_module._background_tasks) - before
+    for task in leaked:
+        task.cancel()
+    await asyncio.gather(*leaked, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_workspace_credential_refreshes_ahead_of_expiry(monkeypatch, background_tasks):
+    monkeypatch.setattr(tcadp_module.tagentic_config, "TC_WORKSPACE_CREDENTIAL_REFRESH_AHEAD", 60)
+    vendor_app, calls = make_vendor(monkeypatch, expires_in=30)
+
+    assert (await vendor_app._workspace_credential("a", "w"))[2] == "token-1"
+    # 即将过期：先返回当前凭证，同时在后台刷新
+    assert (await vendor_app._workspace_credential("a", "w"))[2] == "token-1"
+    await asyncio.gather(*tcadp_module._background_tasks)
+    assert len(calls) == 2
+    assert (await vendor_app._workspace_credential("a", "w"))[2] == "token-2"
+
+
+def test_workspace_credential_expiry_from_jwt():
+    exp = int(time.time()) + 1234
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).decode().rstrip("=")
+    token = f"header.{payload}.signature"
+
+    assert TCADP._workspace_credential_expires_at({"AccessToken": token}) == exp
+    assert TCADP._workspace_credential_expires_at({"ExpiredTime": exp * 1000}) == exp
+
+
+def make_list_dir_vendor(monkeypatch):
+    calls = []
+
+    async def fake_list_dir(self, app_id, path, depth, workspace_id):
+        calls.append(path)
+        await asyncio.sleep(0.01)
+        return {"entries": [
+            {"path": f"{path}/sub", "type": "FILE_TYPE_DIRECTORY"},
+            {"path": f"{path}/a.txt", "type": "FILE_TYPE_FILE"},
+        ]}
+
+    monkeypatch.setattr(TCADP, "_list_dir", fake_list_dir)
+    monkeypatch.setattr(tcadp_module, "_list_dir_cache", tcadp_module.LRUCache(maxsize=16, ttl=10))
+    monkeypatch.setattr(tcadp_module, "_conversation_workspaces", tcadp_module.LRUCache(maxsize=16))
+    monkeypatch.setattr(tcadp_module, "_workspace_generations", tcadp_module.LRUCache(maxsize=16))
+    return TCADP({"AppKey": "app-key"}, "app-1"), calls
+
+
+@pytest.mark.asyncio
+async def test_list_dir_is_cached_until_turn_ends(monkeypatch):
+    monkeypatch.setattr(tcadp_module.tagentic_config, "TC_LIST_DIR_PREFETCH", False)
+    vendor_app, calls = make_list_dir_vendor(monkeypatch)
+
+    results = await asyncio.gather(*(vendor_app.list_dir("a", "/workdir", 1, "w") for _ in range(3)))
+    assert calls == ["/workdir"]
+    assert results[0] == results[1]
+    await vendor_app.list_dir("a", "/workdir", 1, "w")
+    assert calls == ["/workdir"]
+
+    # 会话的一轮对话结束后，该工作空间的目录缓存作废
+    vendor_app._remember_workspace({"ConversationId": "c"}, {"Workspace": {"WorkspaceId": "w"}})
+    vendor_app._invalidate_workspace_listing("c")
+    await vendor_app.list_dir("a", "/workdir", 1, "w")
+    assert calls == ["/workdir", "/workdir"]
+
+
+@pytest.mark.asyncio
+async def test_list_dir_is_invalidated_for_unknown_conversation_workspace(monkeypatch):
+    monkeypatch.setattr(tcadp_module.tagentic_config, "TC_LIST_DIR_PREFETCH", False)
+    vendor_app, calls = make_list_dir_vendor(monkeypatch)
+
+    await vendor_app.list_dir("a", "/workdir", 1, "w")
+    await vendor_app.list_dir("a", "/workdir", 1, "w3")
+    assert calls == ["/workdir", "/workdir"]
+
+    # 本 worker 未见过该会话的 DescribeConversation：作废本应用下全部工作空间
+    vendor_app._invalidate_workspace_listing("new-conversation")
+    await vendor_app.list_dir("a", "/workdir", 1, "w")
+    await vendor_app.list_dir("a", "/workdir", 1, "w3")
+    assert calls == ["/workdir"] * 4
+
+    # 其它应用的缓存不受影响
+    other_app = TCADP({"AppKey": "app-key"}, "app-2")
+    await other_app.list_dir("a", "/workdir", 1, "w")
+    other_app._invalidate_workspace_listing(None)
+    await vendor_app.list_dir("a", "/workdir", 1, "w")
+    assert calls == ["/workdir"] * 5
+
+
+def test_workspace_generation_is_not_reused_after_eviction(monkeypatch):
+    vendor_app, _ = make_list_dir_vendor(monkeypatch)
+    monkeypatch.setattr(tcadp_module, "_workspace_generations", tcadp_module.LRUCache(maxsize=2))
+
+    generation = vendor_app._listing_generation("w")
+    vendor_app._listing_generation("w4")
+    # (app-1, w) 已被淘汰，重新分配的代数不会命中旧缓存条目
+    assert vendor_app._listing_generation("w")[1] != generation[1]
+
+
+async def list_dir_and_prefetch(vendor_app, path):
+    """列目录并等待本次调用发起的预取任务（只等待新任务，不涉及其他测试遗留的后台任务）"""
+    before = set(tcadp_module._background_tasks)
+    await vendor_app.list_dir("a", path, 1, "w2")
+    await asyncio.gather(*(set(tcadp_module._background_tasks) - before))
+
+
+@pytest.mark.asyncio
+async def test_list_dir_prefetches_sub_directories(monkeypatch):
+    monkeypatch.setattr(tcadp_module.tagentic_config, "TC_LIST_DIR_PREFETCH", True)
+    vendor_app, calls = make_list_dir_vendor(monkeypatch)
+
+    await list_dir_and_prefetch(vendor_app, "/workdir")
+    assert calls == ["/workdir", "/workdir/sub"]
+
+    # 展开子目录直接命中缓存（其子目录继续在后台预取）
+    await list_dir_and_prefetch(vendor_app, "/workdir/sub")
+    assert calls == ["/workdir", "/workdir/sub", "/workdir/sub/sub"]
@@ -0,0 +1,264 @@
+"""
+缓存工具
+
+- LRUCache：进程内有界 LRU
+- TieredCache：进程内 LRU + 可选的 Redis 二级缓存（REDIS_ENABLED），多 worker / 多实例共享
+- SingleFlight：合并同一 key 的并发调用
+- StreamFlight：合并同一 key 的并发流式调用，产生的数据广播给所有调用方
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable
+
+from redis.exceptions import RedisError
+
+from util.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LRUCache:
+    """有界 LRU 缓存，条目可带过期时间（epoch 秒）
+
+    仅在单个事件循环内使用，不做线程同步；超出 maxsize 时淘汰最久未访问的条目。
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[Any, float | None]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key, _MISSING)
+        if item is _MISSING:
+            return default
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.time():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None, expires_at: float | None = None):
+        """写入缓存；expires_at 优先于 ttl，二者都未指定时使用默认 ttl"""
+        if expires_at is None:
+            ttl = self.ttl if ttl is None else ttl
+            expires_at = time.time() + ttl if ttl is not None else None
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.pop(key, _MISSING)
+        return default if item is _MISSING else item[0]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+
+class TieredCache:
+    """进程内 LRU + 可选的 Redis 二级缓存
+
+    值需可 JSON 序列化。Redis 未启用或不可达时只使用进程内缓存，出错后 30 秒内不再访问 Redis。
+    delete 会同时删除本进程与 Redis 中的条目；其他 worker 的进程内副本最多在 local_ttl 秒后过期，
+    因此 local_ttl 应取较短的值。
+    """
+
+    _REDIS_RETRY_INTERVAL = 30
+
+    def __init__(self, namespace: str, maxsize: int, ttl: float, local_ttl: float | None = None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.local = LRUCache(maxsize, ttl=min(ttl, local_ttl) if local_ttl else ttl)
+        self._redis_retry_at = 0.0
+
+    def _key(self, key: str) -> str:
+        return f'tagentic:{self.namespace}:{key}'
+
+    def _redis(self):
+        if time.monotonic() < self._redis_retry_at:
+            return None
+        return get_redis()
+
+    def _redis_failed(self, op: str, e: Exception):
+        self._redis_retry_at = time.monotonic() + self._REDIS_RETRY_INTERVAL
+        logger.warning(
+            f'[TieredCache:{self.namespace}] redis {op} failed, '
+            f'using local cache only for {self._REDIS_RETRY_INTERVAL}s: {e}'
+        )
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        client = self._redis()
+        if client is None:
+            return default
+        try:
+            raw = await client.get(self._key(key))
+        except (RedisError, OSError) as e:
+            self._redis_failed('get', e)
+            return default
+        if raw is None:
+            return default
+        value = json.loads(raw)
+        self.local.set(key, value)
+        return value
+
+    async def get_many(self, keys: list[str]) -> dict[str, Any]:
+        """批量读取，返回命中的 {key: value}；本进程未命中的 key 用一次 MGET 从 Redis 读取"""
+        result = {}
+        missing = []
+        for key in keys:
+            value = self.local.get(key, _MISSING)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                result[key] = value
+        client = self._redis()
+        if client is None or not missing:
+            return result
+        try:
+            raws = await client.mget([self._key(key) for key in missing])
+        except (RedisError, OSError) as e:
+            self._redis_failed('mget', e)
+            return result
+        for key, raw in zip(missing, raws):
+            if raw is not None:
+                value = json.loads(raw)
+                self.local.set(key, value)
+                result[key] = value
+        return result
+
+    async def set(self, key: str, value: Any, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else ttl
+        self.local.set(key, value, ttl=min(ttl, self.local.ttl))
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            await client.set(self._key(key), json.dumps(value), px=int(ttl * 1000))
+        except (RedisError, OSError) as e:
+            self._redis_failed('set', e)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self.local.pop(key)
+        client = self._redis()
+        if client is None or not keys:
+            return
+        try:
+            await client.delete(*(self._key(key) for key in keys))
+        except (RedisError, OSError) as e:
+            self._redis_failed('delete', e)
+
+    async def lock(self, key: str, ttl: float) -> bool:
+        """尝试在 ttl 秒内独占 key（如只让一个 worker 回源），到期自动释放
+
+        Redis 未启用或不可达时无法跨 worker 协调，总是返回 True。
+        """
+        client = self._redis()
+        if client is None:
+            return True
+        try:
+            return bool(await client.set(self._key(f'lock:{key}'), '1', nx=True, px=int(ttl * 1000)))
+        except (RedisError, OSError) as e:
+            self._redis_failed('lock', e)
+            return True
+
+
+class SingleFlight:
+    """合并同一 key 的并发调用：只有第一个调用方真正执行，其余调用方等待同一结果（或同一异常）
+
+    调用在独立的 task 中执行，个别调用方被取消（如客户端断开）不会影响其他等待者。
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # 所有调用方都已取消时，避免 "exception was never retrieved" 告警
+        if not task.cancelled():
+            task.exception()
+
+
+class _Flight:
+    def __init__(self):
+        self.chunks: list[Any] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.condition = asyncio.Condition()
+        self.task: asyncio.Task | None = None
+
+
+class StreamFlight:
+    """合并同一 key 的并发流式调用：只有第一个调用方真正执行，产生的每一块数据广播给所有调用方
+
+    后加入的调用方先回放已产生的数据，再跟随新数据直到结束；上游异常会在每个调用方处重新抛出。
+    数据在独立的 task 中产生，个别调用方断开不会影响上游请求和其他调用方。
+    """
+
+    def __init__(self):
+        self._flights: dict[Hashable, _Flight] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def subscribe(self, key: Hashable, fn: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.ensure_future(self._produce(key, flight, fn))
+        cursor = 0
+        while True:
+            async with flight.condition:
+                await flight.condition.wait_for(lambda: len(flight.chunks) > cursor or flight.done)
+            while cursor < len(flight.chunks):
+                chunk = flight.chunks[cursor]
+                cursor += 1
+                yield chunk
+            if flight.done and cursor >= len(flight.chunks):
+                if flight.error is not None:
+                    raise flight.error
+                return
+
+    async def _produce(self, key: Hashable, flight: _Flight, fn: Callable[[], AsyncIterator[Any]]):
+        try:
+            async for chunk in fn():
+                flight.chunks.append(chunk)
+                async with flight.condition:
+                    flight.condition.notify_all()
+        except Exception as e:  # pylint: disable=broad-except
+            flight.error = e
+        finally:
+            flight.done = True
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            async with flight.condition:
+                flight.condition.notify_all()
@@ -4,9 +4,15 @@ COS 对象存储桶管理工具
 提供桶的存在性检查与自动创建功能，以及文件上传、预签名 URL 生成等能力。
 公用参数（SecretId / SecretKey / Region / Bucket）统一从 tagentic_config 读取，
 调用方无需重复传入。
+
+qcloud_cos SDK 与 requests 都是同步阻塞的，异步代码中应使用 *_async 版本，
+它们在专用的有界线程池（cos_executor）中执行，不阻塞事件循环。
 """
+import asyncio
 import hashlib
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 import requests
@@ -375,3 +381,99 @@ def get_presigned_preview_url(
 
     logger.info(f"[COS] 获取到预览地址: {preview_url[:100]}...")
     return preview_url
+
+
+class CosExecutor:
+    """执行阻塞 COS 调用的专用线程池（每个 worker 最多 COS_EXECUTOR_WORKERS 个线程）
+
+    与默认线程池隔离，COS 变慢时不会占满其他 run_in_executor 调用的线程；
+    stats() 提供排队与耗时指标，见 /system/pool/stats。
+    """
+
+    # 超过该耗时（秒）的调用打印告警日志
+    SLOW_CALL = 1.0
+
+    def __init__(self):
+        self._executor: ThreadPoolExecutor | None = None
+        self._in_flight = 0
+        self._calls = 0
+        self._errors = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+        self._run_max = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=tagentic_config.COS_EXECUTOR_WORKERS, thread_name_prefix='cos',
+            )
+        return self._executor
+
+    async def run(self, fn, *args, **kwargs):
+        submitted = time.monotonic()
+        timing = {}
+
+        def call():
+            timing['started'] = time.monotonic()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timing['finished'] = time.monotonic()
+
+        self._in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), call)
+        except Exception:
+            self._errors += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            if 'finished' in timing:
+                wait = timing['started'] - submitted
+                elapsed = timing['finished'] - timing['started']
+                self._calls += 1
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+                self._run_total += elapsed
+                self._run_max = max(self._run_max, elapsed)
+                if elapsed > self.SLOW_CALL or wait > self.SLOW_CALL:
+                    logger.warning(
+                        f"[COS] slow call {getattr(fn, '__name__', fn)}: wait={wait:.3f}s, run={elapsed:.3f}s"
+                    )
+
+    def stats(self) -> dict:
+        calls = self._calls or 1
+        return {
+            'max_workers': tagentic_config.COS_EXECUTOR_WORKERS,
+            'in_flight': self._in_flight,
+            'calls': self._calls,
+            'errors': self._errors,
+            'avg_wait_ms': round(self._wait_total / calls * 1000, 1),
+            'max_wait_ms': round(self._wait_max * 1000, 1),
+            'avg_run_ms': round(self._run_total / calls * 1000, 1),
+            'max_run_ms': round(self._run_max * 1000, 1),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+cos_executor = CosExecutor()
+
+
+async def upload_async(*args, **kwargs) -> str:
+    """upload 的异步版本，参数相同"""
+    return await cos_executor.run(upload, *args, **kwargs)
+
+
+async def get_presigned_download_url_async(*args, **kwargs) -> str:
+    """get_presigned_download_url 的异步版本，参数相同"""
+    return await cos_executor.run(get_presigned_download_url, *args, **kwargs)
+
+
+async def get_presigned_preview_url_async(*args, **kwargs) -> str:
+    """get_presigned_preview_url 的异步版本，参数相同"""
+    return await cos_executor.run(get_presigned_preview_url, *args, **kwargs)
@@ -0,0 +1,65 @@
+"""
+下载代理工具
+
+解析 HTTP Range 请求头（仅支持单个区间），上游不支持 Range 时按区间从完整响应中截取，
+保证浏览器 / 播放器总能拖动进度和断点续传。
+"""
+from typing import AsyncIterator
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """把 Range 请求头解析为闭区间 (start, end)
+
+    没有 Range、格式无法识别或包含多个区间时返回 None（按 RFC 9110 忽略 Range，返回完整内容）；
+    区间超出文件大小时抛出 RangeNotSatisfiable。
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, sep, last = spec.strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if first == '':
+            # bytes=-N：最后 N 个字节
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable()
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def if_range_matches(if_range: str | None, etag: str | None, last_modified: str | None) -> bool:
+    """If-Range 与当前资源的 ETag（强校验）或 Last-Modified 一致时才返回区间内容"""
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return bool(etag) and not if_range.startswith('W/') and if_range == etag
+    return bool(last_modified) and if_range == last_modified
+
+
+async def slice_chunks(chunks: AsyncIterator[bytes], start: int, end: int) -> AsyncIterator[bytes]:
+    """从完整内容的数据块中截取 [start, end] 区间"""
+    offset = 0
+    async for chunk in chunks:
+        chunk_end = offset + len(chunk)
+        if chunk_end > start:
+            yield chunk[max(start - offset, 0):end + 1 - offset]
+        offset = chunk_end
+        if offset > end:
+            break
@@ -1,5 +1,6 @@
 from typing import cast, Optional
 from urllib.parse import urlparse
+import json
 import re
 
 from sanic.request.types import Request
@@ -64,6 +65,37 @@ def convert_dict_keys_to_pascal(d):
     return d
 
 
+# SSE 帧头部的事件类型，如 data:{"Type":"text.delta",...}；只认紧跟在 `data:{` 之后的顶层 Type，
+# 避免匹配到内容中嵌套的 Type（如 response.completed 的 "Contents":[{"Type":"text",...}]）
+SSE_TYPE_PATTERN = re.compile(rb'data:\s*\{\s*"Type"\s*:\s*"([^"]*)"')
+SSE_TYPE_SNIFF_BYTES = 128
+
+
+def sniff_event_type(frame: bytes) -> Optional[str]:
+    """不解析 JSON，从 SSE data 帧开头快速取出事件类型
+
+    顶层 Type 不是第一个键时返回 None，由调用方回退到 json.loads。
+    """
+    match = SSE_TYPE_PATTERN.match(frame, 0, SSE_TYPE_SNIFF_BYTES)
+    return match.group(1).decode() if match else None
+
+
+def doc_parse_success(data: bytes) -> Optional[dict]:
+    """实时文档解析（docParse）SSE 数据中解析成功（SUCCESS 且 doc_id 有效）的 status payload，没有时返回 None"""
+    if b'SUCCESS' not in data:
+        return None
+    for line in data.decode('utf-8', errors='ignore').splitlines():
+        if not line.startswith('data:'):
+            continue
+        try:
+            payload = json.loads(line[len('data:'):]).get('payload') or {}
+        except (ValueError, AttributeError):
+            continue
+        if payload.get('status') == 'SUCCESS' and str(payload.get('doc_id') or '0') != '0':
+            return {**payload, 'process': 100}
+    return None
+
+
 def to_event(
     event_type: EventType,
     record: Optional[Record] = None,
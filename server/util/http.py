@@ -0,0 +1,188 @@
+"""
+上游 HTTP 长连接池
+
+腾讯云 API（lke / adp / lkeap）、SSE、工作空间存储等上游按 host 各自维护一个
+keep-alive 的 aiohttp.ClientSession，避免每次请求重复 DNS 解析、TCP 建连和 TLS 握手。
+
+连接池在 before_server_start 中打开、after_server_stop 中关闭（见 middleware/http_client.py）；
+CLI 或单测等未启动 server 的场景下，首次使用时按需懒加载。
+
+SSE 流式请求单独使用 sse_pool：与普通 API 连接隔离，按 worker 限制并发流数量，
+并可通过 stats() 观察占用 / 空闲 / 排队情况，便于结合 SSE_IDLE_TIMEOUT 调优。
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from config import tagentic_config
+
+logger = logging.getLogger(__name__)
+
+
+class SseStreamBusy(Exception):
+    """等待空闲 SSE 流配额超时"""
+
+
+def _origin(url: str) -> str:
+    """提取 url 的 scheme://host[:port] 作为连接池 key"""
+    parts = urlsplit(url)
+    return f'{parts.scheme}://{parts.netloc}'.lower()
+
+
+class HttpClientPool:
+    """按上游 host 划分的 aiohttp 连接池集合"""
+
+    def __init__(self):
+        self._sessions: dict[str, aiohttp.ClientSession] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._closing: set[asyncio.Task] = set()
+
+    def _host_limit(self, origin: str) -> int:
+        host = urlsplit(origin).hostname or ''
+        return tagentic_config.HTTP_POOL_HOST_LIMITS.get(host, tagentic_config.HTTP_POOL_LIMIT_PER_HOST)
+
+    def _create_connector(self, origin: str) -> aiohttp.TCPConnector:
+        limit = self._host_limit(origin)
+        logger.info(f'[{self.__class__.__name__}] new pool for {origin}, limit={limit}')
+        return aiohttp.TCPConnector(
+            limit=limit,
+            limit_per_host=limit,
+            ttl_dns_cache=tagentic_config.HTTP_DNS_CACHE_TTL or None,
+            use_dns_cache=tagentic_config.HTTP_DNS_CACHE_TTL > 0,
+            keepalive_timeout=tagentic_config.HTTP_KEEPALIVE_TIMEOUT,
+        )
+
+    def _create_session(self, origin: str) -> aiohttp.ClientSession:
+        return aiohttp.ClientSession(connector=self._create_connector(origin))
+
+    def _on_loop_changed(self):
+        pass
+
+    def _check_loop(self):
+        # session 与事件循环绑定；循环变化（如单测每个用例一个 loop）时关闭并丢弃旧的连接池
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            if self._sessions:
+                logger.info(f'[{self.__class__.__name__}] event loop changed, closing stale pools')
+                task = loop.create_task(self._close_sessions(self._sessions))
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
+            self._sessions = {}
+            self._loop = loop
+            self._on_loop_changed()
+
+    async def _close_sessions(self, sessions: dict[str, aiohttp.ClientSession]):
+        for origin, session in sessions.items():
+            try:
+                await session.close()
+            except Exception as e:  # pylint: disable=broad-except
+                # 旧事件循环已关闭时无法正常关闭传输层：解除 session 与连接器的关联，避免 Unclosed client session
+                logger.warning(f'[{self.__class__.__name__}] failed to close pool for {origin}: {e}')
+                session.detach()
+
+    def session(self, url: str) -> aiohttp.ClientSession:
+        """获取 url 所在 host 的共享 session，调用方不应关闭它"""
+        self._check_loop()
+        origin = _origin(url)
+        session = self._sessions.get(origin)
+        if session is None or session.closed:
+            session = self._create_session(origin)
+            self._sessions[origin] = session
+        return session
+
+    def open(self):
+        self._check_loop()
+
+    async def close(self):
+        sessions, self._sessions = self._sessions, {}
+        await self._close_sessions(sessions)
+        self._loop = None
+
+    def stats(self) -> dict:
+        result = {}
+        for origin, session in self._sessions.items():
+            connector = session.connector
+            if connector is None:
+                continue
+            result[origin] = {
+                'limit': connector.limit,
+                'in_use': len(connector._acquired),  # pylint: disable=protected-access
+                'idle': sum(len(conns) for conns in connector._conns.values()),  # pylint: disable=protected-access
+            }
+        return result
+
+
+class SseStreamPool(HttpClientPool):
+    """上游 SSE 专用连接池
+
+    - 连接跨会话复用，省去每轮对话的 TLS 握手
+    - 每个 worker 最多 SSE_MAX_STREAMS 路并发流，超出后排队等待
+    - 读超时使用 SSE_IDLE_TIMEOUT（sock_read），不限制整个流的生命周期
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._slots: asyncio.Semaphore | None = None
+        self._active = 0
+        self._waiting = 0
+
+    def _host_limit(self, origin: str) -> int:
+        return tagentic_config.SSE_MAX_STREAMS
+
+    def _create_session(self, origin: str) -> aiohttp.ClientSession:
+        # total=None：不限制整个请求生命周期，允许长时间对话。
+        # sock_read：两次读操作之间的最大空闲；上游持续吐 chunk 会不断刷新。
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=tagentic_config.SSE_IDLE_TIMEOUT)
+        return aiohttp.ClientSession(
+            connector=self._create_connector(origin),
+            timeout=timeout,
+            read_bufsize=tagentic_config.SSE_READ_BUFSIZE,
+        )
+
+    def _on_loop_changed(self):
+        self._slots = asyncio.Semaphore(tagentic_config.SSE_MAX_STREAMS)
+        self._active = 0
+        self._waiting = 0
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs):
+        """占用一个流配额并发起请求，退出时归还配额
+
+        Raises:
+            SseStreamBusy: 在 SSE_STREAM_WAIT_TIMEOUT 秒内没有空闲配额
+        """
+        session = self.session(url)
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), tagentic_config.SSE_STREAM_WAIT_TIMEOUT)
+        except asyncio.TimeoutError as e:
+            raise SseStreamBusy(f'no free upstream SSE slot ({tagentic_config.SSE_MAX_STREAMS} in use)') from e
+        finally:
+            self._waiting -= 1
+        self._active += 1
+        try:
+            async with session.request(method, url, **kwargs) as resp:
+                yield resp
+        finally:
+            self._active -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            'max_streams': tagentic_config.SSE_MAX_STREAMS,
+            'in_use': self._active,
+            'waiting': self._waiting,
+            'idle': sum(pool['idle'] for pool in super().stats().values()),
+            'idle_timeout': tagentic_config.SSE_IDLE_TIMEOUT,
+        }
+
+
+http_pool = HttpClientPool()
+sse_pool = SseStreamPool()
+
+
+def get_session(url: str) -> aiohttp.ClientSession:
+    return http_pool.session(url)
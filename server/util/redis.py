@@ -0,0 +1,49 @@
+"""
+共享的 Redis 客户端
+
+REDIS_ENABLED=false（默认）时不创建客户端，依赖 Redis 的功能（分布式限流、共享缓存等）
+退回进程内实现；Redis 不可达时调用方同样应退回本地实现，而不是让请求失败。
+"""
+import logging
+
+import redis.asyncio as redis
+
+from config import tagentic_config
+
+logger = logging.getLogger(__name__)
+
+_client: redis.Redis | None = None
+
+
+def get_redis() -> redis.Redis | None:
+    """获取共享的 Redis 客户端，未启用 Redis 时返回 None"""
+    global _client
+    if not tagentic_config.REDIS_ENABLED:
+        return None
+    if _client is None:
+        _client = redis.Redis(
+            host=tagentic_config.REDIS_HOST,
+            port=tagentic_config.REDIS_PORT,
+            username=tagentic_config.REDIS_USERNAME,
+            password=tagentic_config.REDIS_PASSWORD,
+            db=tagentic_config.REDIS_DB,
+            ssl=tagentic_config.REDIS_USE_SSL,
+            socket_timeout=tagentic_config.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=tagentic_config.REDIS_SOCKET_TIMEOUT,
+            health_check_interval=30,
+        )
+        logger.info(
+            f'[redis] client created for '
+            f'{tagentic_config.REDIS_HOST}:{tagentic_config.REDIS_PORT}/{tagentic_config.REDIS_DB}'
+        )
+    return _client
+
+
+async def close_redis():
+    global _client
+    client, _client = _client, None
+    if client is not None:
+        try:
+            await client.aclose()
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning(f'[redis] failed to close client: {e}')
@@ -16,6 +16,7 @@ import aiohttp
 import pydash
 
 from config import tagentic_config
+from util.http import get_session
 
 
 # action_version 配置目录：每个 ServiceVendor 对应一套 JSON 文件
@@ -25,7 +26,12 @@ _ACTION_VERSION_DIR = os.path.join(
 )
 
 def _parse_action_version_raw(config: dict) -> dict:
-    """解析单个 action_version JSON 内容，返回 {Action: {headers: {}, payload: {}, service: str}} 映射"""
+    """解析单个 action_version JSON 内容，返回 {Action: {headers: {}, payload: {}, service: str, cache: dict|None}} 映射
+
+    cache.ttl / cache.key 声明只读 Action 的响应缓存（见 TCADP.forward_request）：
+    - cache.ttl: 缓存秒数，未配置或 <= 0 表示不缓存
+    - cache.key: 参与缓存 key 的 payload 字段路径列表，未配置时使用整个 payload
+    """
     result = {}
     for action, value in config.items():
         if action.startswith('_'):
@@ -35,16 +41,23 @@ def _parse_action_version_raw(config: dict) -> dict:
         headers = {}
         payload_paths = {}  # {dotted_path: value}
         action_service = None
+        cache_ttl = 0
+        cache_key = None
         for k, v in value.items():
             if k == 'service':
                 action_service = v
+            elif k == 'cache.ttl':
+                cache_ttl = float(v)
+            elif k == 'cache.key':
+                cache_key = list(v)
             elif k.startswith('headers.'):
                 header_name = k[len('headers.'):]
                 headers[header_name] = v
             elif k.startswith('payload.'):
                 path_str = k[len('payload.'):]
                 payload_paths[path_str] = v
-        result[action] = {'headers': headers, 'payload': payload_paths, 'service': action_service}
+        cache = {'ttl': cache_ttl, 'key': cache_key} if cache_ttl > 0 else None
+        result[action] = {'headers': headers, 'payload': payload_paths, 'service': action_service, 'cache': cache}
     return result
 
 
@@ -253,6 +266,12 @@ def tc_request_prepare(config: dict, action: str, payload: str, service: str = "
     return headers, url
 
 
+def action_cache_policy(action: str, action_overrides: dict = None) -> dict | None:
+    """action_version 中该 Action 的缓存配置 {ttl, key}，未配置缓存时返回 None"""
+    overrides = action_overrides or {}
+    return overrides.get(action, {}).get('cache')
+
+
 def _resolve_service(action: str, action_overrides: dict = None) -> str:
     """从 action_version 配置中解析 action 对应的目标 service，回退到默认值 'lke'"""
     overrides = action_overrides or {}
@@ -293,24 +312,23 @@ async def tc_request(
         headers.get('X-Qbot-EnvSet'), headers.get('X-TC-Canary'),
         payload,
     )
-    async with aiohttp.ClientSession() as session:
-        async with session.post(full_url, headers=headers, data=payload) as resp:
-            try:
-                return await resp.json()
-            except aiohttp.ContentTypeError:
-                body = await resp.text()
-                logging.error(
-                    '[tc_request] Non-JSON response: status=%s, content_type=%s, url=%s, body=%s',
-                    resp.status, resp.content_type, full_url, body[:500],
-                )
-                return {
-                    'Response': {
-                        'Error': {
-                            'Code': 'InvalidResponse',
-                            'Message': f'Non-JSON response (status={resp.status}, content_type={resp.content_type})',
-                        }
+    async with get_session(full_url).post(full_url, headers=headers, data=payload) as resp:
+        try:
+            return await resp.json()
+        except aiohttp.ContentTypeError:
+            body = await resp.text()
+            logging.error(
+                '[tc_request] Non-JSON response: status=%s, content_type=%s, url=%s, body=%s',
+                resp.status, resp.content_type, full_url, body[:500],
+            )
+            return {
+                'Response': {
+                    'Error': {
+                        'Code': 'InvalidResponse',
+                        'Message': f'Non-JSON response (status={resp.status}, content_type={resp.content_type})',
                     }
                 }
+            }
 
 
 async def tc_request_sse(config: dict, action: str, payload: dict = None, service=None, version: str = None, action_overrides: dict = None):
@@ -330,24 +348,24 @@ async def tc_request_sse(config: dict, action: str, payload: dict = None, servic
         payload = {}
     payload = json.dumps(payload)
     headers, url = tc_request_prepare(config, action, payload, service, version, action_overrides)
-    async with aiohttp.ClientSession() as session:
-        async with session.post(f'{url}/', headers=headers, data=payload) as resp:
-            try:
-                while True:
-                    raw_line = await resp.content.readline()
-                    if resp.headers['Content-Type'] != 'text/event-stream':
-                        yield raw_line
-                        continue
-                    # logging.info(raw_line)
-                    if not raw_line:
-                        break
-                    line = raw_line.decode()
-                    if ':' not in line:
-                        continue
-                    line_type, data = line.split(':', 1)
-                    if line_type == 'data':
-                        yield data
-            except asyncio.CancelledError:
-                logging.info("tc_request_sse: cancelled")
-                resp.close()
-            logging.info("tc_request_sse: done")
+    full_url = f'{url}/'
+    async with get_session(full_url).post(full_url, headers=headers, data=payload) as resp:
+        try:
+            while True:
+                raw_line = await resp.content.readline()
+                if resp.headers['Content-Type'] != 'text/event-stream':
+                    yield raw_line
+                    continue
+                # logging.info(raw_line)
+                if not raw_line:
+                    break
+                line = raw_line.decode()
+                if ':' not in line:
+                    continue
+                line_type, data = line.split(':', 1)
+                if line_type == 'data':
+                    yield data
+        except asyncio.CancelledError:
+            logging.info("tc_request_sse: cancelled")
+            resp.close()
+        logging.info("tc_request_sse: done")
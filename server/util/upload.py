@@ -0,0 +1,117 @@
+"""
+流式上传工具
+
+@stream 路由的请求体按块读取、直接转发给下游（预签名 PUT / COS 分片上传），
+不在 worker 内拼接完整文件；读取过程中累计字节数，超过 FILE_UPLOAD_MAX_SIZE 立即以 413 中止。
+
+直传模式（/file/upload/intent → 浏览器直传 COS → /file/upload/complete）下文件不经过本服务，
+上传意图（对象路径、校验地址等）签名为短期 token 交给浏览器，complete 时验签取回，不依赖服务端状态。
+"""
+import hashlib
+import tempfile
+import time
+from xml.sax.saxutils import escape
+
+import jwt
+from sanic.exceptions import SanicException
+from sanic.request.types import Request
+
+from config import tagentic_config
+
+# 未声明 Content-Length 时先写入临时文件，超过该大小后落盘
+SPOOL_MEMORY_SIZE = 1024 * 1024
+
+
+class RequestBodyStream:
+    """逐块读取请求体的异步可迭代对象，可直接作为 aiohttp 的 data 参数
+
+    length 为客户端声明的 Content-Length（未声明时为 None），size 为已读取的字节数，
+    读取的同时计算 SHA-256，读完后由 hexdigest() 取得，用于上传去重。
+    """
+
+    def __init__(self, request: Request, max_size: int | None = None):
+        self.request = request
+        self.max_size = max_size or tagentic_config.FILE_UPLOAD_MAX_SIZE
+        self.size = 0
+        self.exceeded = False
+        self.length = None
+        self._sha256 = hashlib.sha256()
+        content_length = request.headers.get('content-length')
+        if content_length and content_length.isdigit():
+            self.length = int(content_length)
+            if self.length > self.max_size:
+                raise self.too_large()
+
+    def too_large(self) -> SanicException:
+        return SanicException(f'File exceeds the maximum upload size of {self.max_size} bytes', status_code=413)
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        while True:
+            chunk = await self.request.stream.read()
+            if chunk is None:
+                break
+            self.size += len(chunk)
+            if self.size > self.max_size:
+                self.exceeded = True
+                raise self.too_large()
+            self._sha256.update(chunk)
+            yield chunk
+
+    def hexdigest(self) -> str:
+        return self._sha256.hexdigest()
+
+    async def read(self) -> bytes:
+        """读取完整请求体，仅用于已知较小的文件"""
+        data = bytearray()
+        async for chunk in self:
+            data += chunk
+        return bytes(data)
+
+    async def spool(self) -> tempfile.SpooledTemporaryFile:
+        """写入临时文件（小文件留在内存），返回已回到开头的文件对象，由调用方关闭"""
+        file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_SIZE)
+        try:
+            async for chunk in self:
+                file.write(chunk)
+        except BaseException:
+            file.close()
+            raise
+        file.seek(0)
+        return file
+
+
+def _upload_token_key() -> str:
+    # 与会话 token 使用不同的密钥，避免上传 token 被当作登录凭证
+    return f'{tagentic_config.SECRET_KEY}:file-upload'
+
+
+def create_upload_token(claims: dict, expires: int) -> str:
+    """签发上传意图 token，expires 秒后失效"""
+    return jwt.encode({**claims, 'exp': int(time.time()) + expires}, _upload_token_key(), algorithm='HS256')
+
+
+def check_upload_token(token: str) -> dict:
+    try:
+        return jwt.decode(token, _upload_token_key(), algorithms=['HS256'])
+    except jwt.exceptions.ExpiredSignatureError:
+        raise SanicException('Upload intent has expired', status_code=410)
+    except jwt.exceptions.InvalidTokenError:
+        raise SanicException('Invalid upload token', status_code=400)
+
+
+def complete_multipart_body(parts: list[dict], part_count: int) -> bytes:
+    """CompleteMultipartUpload 请求体；要求按顺序提交全部分片的 ETag"""
+    etags = {}
+    for part in parts or []:
+        if isinstance(part, dict) and part.get('ETag'):
+            etags[int(part.get('PartNumber', 0))] = part['ETag']
+    if sorted(etags) != list(range(1, part_count + 1)):
+        raise SanicException(f'ETag of all {part_count} parts is required', status_code=400)
+    items = ''.join(
+        f'<Part><PartNumber>{number}</PartNumber><ETag>{escape(etags[number])}</ETag></Part>'
+        for number in range(1, part_count + 1)
+    )
+    return f'<CompleteMultipartUpload>{items}</CompleteMultipartUpload>'.encode()
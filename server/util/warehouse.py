@@ -48,14 +48,37 @@ class AsyncWareHouseS3():
     def get_full_url(self, path):
         return self.dict['s3ep_full'] + path
 
-    def put_multipart(self, path):
+    def put_multipart(self, path, content_type: str | None = None):
         path = self.pure_path(path)
         return MultipartUploader(
             session=self.session,
             s3_config=self.dict,
-            path=path
+            path=path,
+            content_type=content_type,
         )
 
+    async def presign(self, client_method, path, expires, **params):
+        """生成 S3 预签名 URL（如 put_object / upload_part / head_object），供浏览器或其他服务直接访问对象"""
+        path = self.pure_path(path)
+        cos_config = Config(s3={'addressing_style': self.dict['addressing_style']})
+        async with self.session.client('s3', endpoint_url=self.dict['s3ep'], config=cos_config) as client:
+            return await client.generate_presigned_url(
+                client_method,
+                Params={'Bucket': self.dict['s3bucket'], 'Key': path, **params},
+                ExpiresIn=expires,
+            )
+
+    async def create_multipart_upload(self, path, content_type: str | None = None) -> str:
+        """发起分片上传并返回 UploadId，分片由调用方通过预签名 URL 上传"""
+        path = self.pure_path(path)
+        cos_config = Config(s3={'addressing_style': self.dict['addressing_style']})
+        create_kwargs = {}
+        if content_type:
+            create_kwargs['ContentType'] = content_type
+        async with self.session.client('s3', endpoint_url=self.dict['s3ep'], config=cos_config) as client:
+            resp = await client.create_multipart_upload(Bucket=self.dict['s3bucket'], Key=path, **create_kwargs)
+        return resp['UploadId']
+
     async def get(self, path, decode='utf-8'):
         path = self.pure_path(path)
         cos_config = Config(s3={'addressing_style': self.dict['addressing_style']})
@@ -79,12 +102,19 @@ class AsyncWareHouseS3():
 
 
 class MultipartUploader:
-    """使用 client-level API 进行分片上传，兼容腾讯云 COS HTTPS 接口"""
+    """使用 client-level API 进行分片上传，兼容腾讯云 COS HTTPS 接口
+
+    write 的数据攒够 PART_SIZE 即上传一个分片，内存中最多保留一个分片。
+    """
 
-    def __init__(self, session, s3_config, path):
+    # COS 要求除最后一个分片外每片不小于 1MB
+    PART_SIZE = 1024 * 1024
+
+    def __init__(self, session, s3_config, path, content_type: str | None = None):
         self.session = session
         self.dict = s3_config
         self.path = path
+        self.content_type = content_type
         self.upload_id = None
         self.client = None
         self.parts = []
@@ -97,9 +127,13 @@ class MultipartUploader:
         self.client = await client_ctx.__aenter__()
         self._client_ctx = client_ctx
 
+        create_kwargs = {}
+        if self.content_type:
+            create_kwargs['ContentType'] = self.content_type
         resp = await self.client.create_multipart_upload(
             Bucket=self.dict['s3bucket'],
-            Key=self.path
+            Key=self.path,
+            **create_kwargs
         )
         self.upload_id = resp['UploadId']
         return self
@@ -115,7 +149,8 @@ class MultipartUploader:
                     )
                 return
 
-            if len(self.buf) > 0:
+            # 空文件也要上传一个（空）分片，否则无法完成分片上传
+            if len(self.buf) > 0 or not self.parts:
                 await self._upload_part()
 
             if self.upload_id and self.parts:
@@ -131,11 +166,11 @@ class MultipartUploader:
 
     async def write(self, data):
         self.buf += data
-        if len(self.buf) >= 1024 * 1024:
+        if len(self.buf) >= self.PART_SIZE:
             await self._upload_part()
 
     async def _upload_part(self):
-        if len(self.buf) == 0:
+        if len(self.buf) == 0 and self.parts:
             return
 
         body = bytes(self.buf)